@@ -1,13 +1,12 @@
 import streamlit as st
-import google.generativeai as genai
-import faiss
-import numpy as np
-from pymongo import MongoClient
-from bson import ObjectId
 import os
 from dotenv import load_dotenv
 import config
 import html
+import resources
+import index_store
+import retrieval
+import hydration
 
 # Load environment variables
 load_dotenv()
@@ -15,8 +14,10 @@ load_dotenv()
 # Get environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MONGO_URI = os.getenv("MONGO_URI")
+EMBEDDER = os.getenv("EMBEDDER", "gemini")
+INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() == "true"
 
-if not GEMINI_API_KEY:
+if EMBEDDER == "gemini" and not GEMINI_API_KEY:
     st.error("GEMINI_API_KEY not found in environment variables")
     st.stop()
 
@@ -307,40 +308,50 @@ def render_stars(rating):
     except (ValueError, TypeError):
         return "Not rated"
 
-# Configure Gemini API
+# Create the embedder (cached across reruns; "gemini" also configures the API key)
 try:
-    genai.configure(api_key=GEMINI_API_KEY)
+    embedder = resources.get_embedder(EMBEDDER, GEMINI_API_KEY)
 except Exception as e:
-    st.error(f"Error configuring Gemini API: {e}")
+    st.error(f"Error configuring embedder: {e}")
+    embedder = None
 
-# Connect to MongoDB Atlas
+# Connect to MongoDB Atlas (one shared client per process)
 try:
-    client = MongoClient(MONGO_URI)
-    db = client["hostelDB"]
-    hostel_collection = db["hostels"]
+    hostel_collection = resources.get_hostel_collection(MONGO_URI, "hostelDB", "hostels")
     # Connection successful, but no need to show success message to keep UI clean
 except Exception as e:
     st.error(f"Error connecting to MongoDB Atlas: {e}")
     hostel_collection = None
 
-# Load FAISS index and hostel IDs
+# Load FAISS index and hostel IDs (loaded once per process; each run takes the
+# currently published version, which is swapped in without a restart)
 try:
-    index = faiss.read_index("hostel_index.faiss")
-    hostel_ids = np.load("hostel_ids.npy")
+    search_index = resources.get_live_index(mmap=INDEX_MMAP).current()
+    if embedder is not None:
+        index_store.check_embedder(search_index.meta, embedder)
+    index, hostel_ids = search_index.index, search_index.hostel_ids
 except Exception as e:
     st.error(f"Error loading FAISS index or hostel IDs: {e}")
     index = None
     hostel_ids = None
 
-# Function to generate embeddings
+# Cache of query embeddings shared by every session
+query_cache = resources.get_query_cache(EMBEDDER)
+
+# Cache of hostel documents shared by every session (edits invalidate their entries)
+document_cache = None
+if hostel_collection is not None:
+    document_cache = resources.get_document_cache(MONGO_URI, "hostelDB", "hostels")
+
+# Function to generate embeddings (repeated queries are served from the cache)
 def get_embedding(text):
+    cached = query_cache.get(text)
+    if cached is not None:
+        return cached
     try:
-        response = genai.embed_content(
-            model="models/embedding-001",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return np.array(response["embedding"], dtype="float32")
+        embedding = embedder.embed_one(text)
+        query_cache.put(text, embedding)
+        return embedding
     except Exception as e:
         st.error(f"Error generating embedding: {e}")
         return None
@@ -381,7 +392,7 @@ if search_pressed:
                     <strong>Error:</strong> Search index not available. Please try again later or contact support.
                 </div>
             """, unsafe_allow_html=True)
-        elif hostel_collection is None:
+        elif hostel_collection is None and search_index.snapshot is None:
             st.markdown("""
                 <div class="error-message">
                     <strong>Error:</strong> Database connection not available. Please try again later or contact support.
@@ -390,9 +401,14 @@ if search_pressed:
         else:
             with st.spinner("Searching for your perfect hostel match..."):
                 query_embedding = get_embedding(query)
-                if query_embedding is not None:
-                    query_embedding = query_embedding.reshape(1, -1)
-                    D, I = index.search(query_embedding, k=5)
+                # Without an embedding the keyword index still answers the query
+                if query_embedding is not None or search_index.lexical is not None:
+                    if query_embedding is not None:
+                        query_embedding = query_embedding.reshape(1, -1)
+                    else:
+                        st.info("Showing keyword matches while semantic search is unavailable.")
+                    # Semantic (FAISS) and keyword (BM25) results fused by rank
+                    D, I = retrieval.hybrid_search(search_index, query, query_embedding, k=5)
 
                     st.markdown('<div class="results-container">', unsafe_allow_html=True)
                     st.markdown(f'<h2 class="results-title">Top Matches for "{escape_html(query)}"</h2>', unsafe_allow_html=True)
@@ -408,72 +424,71 @@ if search_pressed:
                     else:
                         found_results = False
                         
-                        for i in I[0]:
-                            if i != -1 and 0 <= i < len(hostel_ids):
-                                found_results = True
-                                hostel_id = hostel_ids[i]
-                                hostel = hostel_collection.find_one({"_id": ObjectId(hostel_id)})
-
-                                if hostel:
-                                    # Prepare rating display
-                                    rating_display = render_stars(hostel.get('ratings', 'Not rated'))
+                        # Load the hits in rank order from the index snapshot (MongoDB only for what it lacks)
+                        hits = [i for i in I[0] if i != -1 and 0 <= i < len(hostel_ids)]
+                        found_results = bool(hits)
+                        hostels, _ = hydration.hydrate_labels(search_index, hostel_collection, hits,
+                                                                cache=document_cache)
+                        for hostel in hostels:
+                            # Prepare rating display
+                            rating_display = render_stars(hostel.get('ratings', 'Not rated'))
                                     
-                                    # Get and escape hostel data
-                                    hostel_name = escape_html(hostel.get('name', 'Unknown Hostel'))
-                                    hostel_location = escape_html(hostel.get('location', 'Location not specified'))
-                                    hostel_rent = escape_html(hostel.get('monthly_rent', 'N/A'))
-                                    hostel_description = escape_html(hostel.get('description', 'No description available'))                                  
-
-                                    # Hostel name
-                                    st.markdown(f"""<div class='hostel-card'>{hostel_name}</div>""", unsafe_allow_html=True)
-
-                                    # Location
-                                    st.markdown(f"""<div class='hostel-detail'><strong>📍 Location:</strong> {hostel_location}</div>""", unsafe_allow_html=True)
-
-                                    # Price and rating container
-                                    st.markdown("""<div style="display: flex; flex-wrap: wrap; align-items: center; margin-top: 0.5rem;">""", unsafe_allow_html=True)
-                                    st.markdown(f"""<div class='price-badge'>💰 ₹{hostel_rent} / month</div>""", unsafe_allow_html=True)
-                                    st.markdown(f"""<div class='rating-stars'>⭐ {rating_display}</div>""", unsafe_allow_html=True)
-                                    st.markdown("""</div>""", unsafe_allow_html=True)  # Close flex container
-
-                                    # About section
-                                    st.markdown("""<div class='hostel-section'><div class='section-title'>About this Hostel</div></div>""", unsafe_allow_html=True)
-                                    st.markdown(f"""<div class='hostel-detail'>{hostel_description}</div>""", unsafe_allow_html=True)
-
-                                    # Facilities
-                                    if hostel.get('facilities'):
-                                        st.markdown("<div class='section-title'>Facilities & Amenities</div>", unsafe_allow_html=True)
-                                        facility_html = ""
-                                        for idx, facility in enumerate(hostel['facilities']):
-                                            margin_style = 'margin-left: 5rem;' if idx == 0 else ''
-                                            facility_html += f"<div class='facility-tag' style='{margin_style}'>🏷️ {escape_html(facility)}</div>"
-                                        st.markdown(f"<div style='display: flex; flex-wrap: wrap;'>{facility_html}</div>", unsafe_allow_html=True)
-
-                                    # Room types
-                                    if hostel.get('room_types'):
-                                        st.markdown("<div class='section-title'>Available Room Types</div>", unsafe_allow_html=True)
-                                        room_html = ""
-                                        for idx, room in enumerate(hostel['room_types']):
-                                            margin_style = 'margin-left: 5rem;' if idx == 0 else ''
-                                            room_html += f"<div class='room-type-tag' style='{margin_style}'>🛏️ {escape_html(room)}</div>"
-                                        st.markdown(f"<div style='display: flex; flex-wrap: wrap;'>{room_html}</div>", unsafe_allow_html=True)
-
-                                    # Contact information
-                                    contact_phone = escape_html(hostel.get('contact', {}).get('phone', 'Not provided'))
-                                    contact_email = escape_html(hostel.get('contact', {}).get('email', 'Not provided'))
-
-                                    st.markdown("""<div class='section-title'>Contact Information</div>""", unsafe_allow_html=True)
-                                    st.markdown("""<div style="display: flex; flex-wrap: wrap;">""", unsafe_allow_html=True)
-                                    st.markdown(f"""<div class='contact-badge'>📞 {contact_phone}</div>""", unsafe_allow_html=True)
-                                    if contact_email != 'Not provided':
-                                        st.markdown(f"""<div class='contact-badge' style="margin-left: 0.5rem;">✉️ {contact_email}</div>""", unsafe_allow_html=True)
-                                    st.markdown("""</div>""", unsafe_allow_html=True)  # Close flex container
-
-                                    # Close hostel-card div (ONLY ONCE at the very end)
-                                    st.markdown("""</div>""", unsafe_allow_html=True)
-
-                                    # Add divider outside the card
-                                    st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
+                            # Get and escape hostel data
+                            hostel_name = escape_html(hostel.get('name', 'Unknown Hostel'))
+                            hostel_location = escape_html(hostel.get('location', 'Location not specified'))
+                            hostel_rent = escape_html(hostel.get('monthly_rent', 'N/A'))
+                            hostel_description = escape_html(hostel.get('description', 'No description available'))                                  
+
+                            # Hostel name
+                            st.markdown(f"""<div class='hostel-card'>{hostel_name}</div>""", unsafe_allow_html=True)
+
+                            # Location
+                            st.markdown(f"""<div class='hostel-detail'><strong>📍 Location:</strong> {hostel_location}</div>""", unsafe_allow_html=True)
+
+                            # Price and rating container
+                            st.markdown("""<div style="display: flex; flex-wrap: wrap; align-items: center; margin-top: 0.5rem;">""", unsafe_allow_html=True)
+                            st.markdown(f"""<div class='price-badge'>💰 ₹{hostel_rent} / month</div>""", unsafe_allow_html=True)
+                            st.markdown(f"""<div class='rating-stars'>⭐ {rating_display}</div>""", unsafe_allow_html=True)
+                            st.markdown("""</div>""", unsafe_allow_html=True)  # Close flex container
+
+                            # About section
+                            st.markdown("""<div class='hostel-section'><div class='section-title'>About this Hostel</div></div>""", unsafe_allow_html=True)
+                            st.markdown(f"""<div class='hostel-detail'>{hostel_description}</div>""", unsafe_allow_html=True)
+
+                            # Facilities
+                            if hostel.get('facilities'):
+                                st.markdown("<div class='section-title'>Facilities & Amenities</div>", unsafe_allow_html=True)
+                                facility_html = ""
+                                for idx, facility in enumerate(hostel['facilities']):
+                                    margin_style = 'margin-left: 5rem;' if idx == 0 else ''
+                                    facility_html += f"<div class='facility-tag' style='{margin_style}'>🏷️ {escape_html(facility)}</div>"
+                                st.markdown(f"<div style='display: flex; flex-wrap: wrap;'>{facility_html}</div>", unsafe_allow_html=True)
+
+                            # Room types
+                            if hostel.get('room_types'):
+                                st.markdown("<div class='section-title'>Available Room Types</div>", unsafe_allow_html=True)
+                                room_html = ""
+                                for idx, room in enumerate(hostel['room_types']):
+                                    margin_style = 'margin-left: 5rem;' if idx == 0 else ''
+                                    room_html += f"<div class='room-type-tag' style='{margin_style}'>🛏️ {escape_html(room)}</div>"
+                                st.markdown(f"<div style='display: flex; flex-wrap: wrap;'>{room_html}</div>", unsafe_allow_html=True)
+
+                            # Contact information
+                            contact_phone = escape_html(hostel.get('contact', {}).get('phone', 'Not provided'))
+                            contact_email = escape_html(hostel.get('contact', {}).get('email', 'Not provided'))
+
+                            st.markdown("""<div class='section-title'>Contact Information</div>""", unsafe_allow_html=True)
+                            st.markdown("""<div style="display: flex; flex-wrap: wrap;">""", unsafe_allow_html=True)
+                            st.markdown(f"""<div class='contact-badge'>📞 {contact_phone}</div>""", unsafe_allow_html=True)
+                            if contact_email != 'Not provided':
+                                st.markdown(f"""<div class='contact-badge' style="margin-left: 0.5rem;">✉️ {contact_email}</div>""", unsafe_allow_html=True)
+                            st.markdown("""</div>""", unsafe_allow_html=True)  # Close flex container
+
+                            # Close hostel-card div (ONLY ONCE at the very end)
+                            st.markdown("""</div>""", unsafe_allow_html=True)
+
+                            # Add divider outside the card
+                            st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
                         
                         if not found_results:
@@ -1,45 +1,48 @@
 import streamlit as st
-import google.generativeai as genai
-import faiss
-import numpy as np
-from pymongo import MongoClient
-from bson import ObjectId
 import config
+import resources
+import index_store
+import hydration
 
-# Configure Gemini API
+# Create the embedder (cached across reruns; "gemini" also configures the API key)
 try:
-    genai.configure(api_key=config.GEMINI_API_KEY)
+    embedder = resources.get_embedder(config.EMBEDDER, config.GEMINI_API_KEY)
 except Exception as e:
-    st.error(f"Error configuring Gemini API: {e}")
+    st.error(f"Error configuring embedder: {e}")
+    embedder = None
 
-# Connect to MongoDB Atlas
+# Connect to MongoDB Atlas (one shared client per process)
 try:
-    client = MongoClient(config.MONGO_URI)
-    db = client[config.DB_NAME]
-    hostel_collection = db[config.COLLECTION_NAME]
+    hostel_collection = resources.get_hostel_collection(config.MONGO_URI, config.DB_NAME, config.COLLECTION_NAME)
     # st.success("Successfully connected to MongoDB Atlas!")
 except Exception as e:
     st.error(f"Error connecting to MongoDB Atlas: {e}")
     hostel_collection = None
 
-# Load FAISS index and hostel IDs
+# Load FAISS index and hostel IDs (loaded once per process; each run takes the
+# currently published version, which is swapped in without a restart)
 try:
-    index = faiss.read_index("hostel_index.faiss")
-    hostel_ids = np.load("hostel_ids.npy")
+    search_index = resources.get_live_index(mmap=config.INDEX_MMAP).current()
+    if embedder is not None:
+        index_store.check_embedder(search_index.meta, embedder)
+    index, hostel_ids = search_index.index, search_index.hostel_ids
 except Exception as e:
     st.error(f"Error loading FAISS index or hostel IDs: {e}")
     index = None
     hostel_ids = None
 
-# Function to generate embeddings
+# Cache of query embeddings shared by every session
+query_cache = resources.get_query_cache(config.EMBEDDER)
+
+# Function to generate embeddings (repeated queries are served from the cache)
 def get_embedding(text):
+    cached = query_cache.get(text)
+    if cached is not None:
+        return cached
     try:
-        response = genai.embed_content(
-            model="models/embedding-001",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return np.array(response["embedding"], dtype="float32")
+        embedding = embedder.embed_one(text)
+        query_cache.put(text, embedding)
+        return embedding
     except Exception as e:
         st.error(f"Error generating embedding: {e}")
         return None
@@ -57,7 +60,7 @@ if st.button("Search"):
     else:
         if not index or hostel_ids is None:
             st.error("FAISS index not available")
-        elif hostel_collection is None:
+        elif hostel_collection is None and search_index.snapshot is None:
             st.error("MongoDB connection not available")
         else:
             with st.spinner("Searching..."):
@@ -74,26 +77,24 @@ if st.button("Search"):
                         st.info("No matching hostels found")
                     else:
                         # Display results
-                        for i in I[0]:
-                            if 0 <= i < len(hostel_ids):
-                                hostel_id = hostel_ids[i]
-                                hostel = hostel_collection.find_one({"_id": ObjectId(hostel_id)})
-
-                                if hostel:
-                                    with st.expander(f"🏠 {hostel.get('name', 'Unknown')}"):
-                                        st.write(f"**Location:** {hostel.get('location', 'Not specified')}")
-                                        st.write(f"**Description:** {hostel.get('description', 'No description available')}")
+                        # Load the hits in rank order from the index snapshot (MongoDB only for what it lacks)
+                        hits = [i for i in I[0] if 0 <= i < len(hostel_ids)]
+                        hostels, _ = hydration.hydrate_labels(search_index, hostel_collection, hits)
+                        for hostel in hostels:
+                            with st.expander(f"🏠 {hostel.get('name', 'Unknown')}"):
+                                st.write(f"**Location:** {hostel.get('location', 'Not specified')}")
+                                st.write(f"**Description:** {hostel.get('description', 'No description available')}")
                                         
-                                        if hostel.get('facilities'):
-                                            st.write("**Facilities:**")
-                                            for facility in hostel['facilities']:
-                                                st.write(f"- {facility}")
+                                if hostel.get('facilities'):
+                                    st.write("**Facilities:**")
+                                    for facility in hostel['facilities']:
+                                        st.write(f"- {facility}")
                                         
-                                        if hostel.get('room_types'):
-                                            st.write("**Room Types:**")
-                                            for room in hostel['room_types']:
-                                                st.write(f"- {room}")
+                                if hostel.get('room_types'):
+                                    st.write("**Room Types:**")
+                                    for room in hostel['room_types']:
+                                        st.write(f"- {room}")
                                         
-                                        st.write(f"**Monthly Rent:** {hostel.get('monthly_rent', 'Not available')}")
-                                        st.write(f"**Ratings:** {hostel.get('ratings', 'Not rated')}")
-                                        st.write(f"**Contact:** {hostel.get('contact', {}).get('phone', 'Not provided')}")
\ No newline at end of file
+                                st.write(f"**Monthly Rent:** {hostel.get('monthly_rent', 'Not available')}")
+                                st.write(f"**Ratings:** {hostel.get('ratings', 'Not rated')}")
+                                st.write(f"**Contact:** {hostel.get('contact', {}).get('phone', 'Not provided')}")
\ No newline at end of file
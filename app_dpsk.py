@@ -1,10 +1,11 @@
 import streamlit as st
-import google.generativeai as genai
-import faiss
-import numpy as np
-from pymongo import MongoClient
-from bson import ObjectId
 import config
+import resources
+import index_store
+import retrieval
+import hydration
+import numpy as np
+from search_sessions import SearchSession, session_key, decode_cursor
 from datetime import datetime
 
 # Set page configuration with new theme
@@ -361,39 +362,52 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Configure Gemini API
+# Create the embedder (cached across reruns; "gemini" also configures the API key)
 try:
-    genai.configure(api_key=config.GEMINI_API_KEY)
+    embedder = resources.get_embedder(config.EMBEDDER, config.GEMINI_API_KEY)
 except Exception as e:
-    st.error(f"Error configuring Gemini API: {e}")
+    st.error(f"Error configuring embedder: {e}")
+    embedder = None
 
-# Connect to MongoDB Atlas
+# Connect to MongoDB Atlas (one shared client per process)
 try:
-    client = MongoClient(config.MONGO_URI)
-    db = client[config.DB_NAME]
-    hostel_collection = db[config.COLLECTION_NAME]
+    hostel_collection = resources.get_hostel_collection(config.MONGO_URI, config.DB_NAME, config.COLLECTION_NAME)
 except Exception as e:
     st.error(f"Error connecting to MongoDB Atlas: {e}")
     hostel_collection = None
 
-# Load FAISS index and hostel IDs
+# Load FAISS index and hostel IDs (loaded once per process; each run takes the
+# currently published version, which is swapped in without a restart)
 try:
-    index = faiss.read_index("hostel_index.faiss")
-    hostel_ids = np.load("hostel_ids.npy")
+    search_index = resources.get_live_index(mmap=config.INDEX_MMAP).current()
+    if embedder is not None:
+        index_store.check_embedder(search_index.meta, embedder)
+    index, hostel_ids = search_index.index, search_index.hostel_ids
 except Exception as e:
     st.error(f"Error loading FAISS index or hostel IDs: {e}")
     index = None
     hostel_ids = None
 
-# Function to generate embeddings
+# Cache of query embeddings shared by every session
+query_cache = resources.get_query_cache(config.EMBEDDER)
+
+# Ranked results of recent searches, so later pages only fetch their own hostels
+search_sessions = resources.get_search_sessions()
+
+# Cache of hostel documents shared by every session (edits invalidate their entries)
+document_cache = None
+if hostel_collection is not None:
+    document_cache = resources.get_document_cache(config.MONGO_URI, config.DB_NAME, config.COLLECTION_NAME)
+
+# Function to generate embeddings (repeated queries are served from the cache)
 def get_embedding(text):
+    cached = query_cache.get(text)
+    if cached is not None:
+        return cached
     try:
-        response = genai.embed_content(
-            model="models/embedding-001",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return np.array(response["embedding"], dtype="float32")
+        embedding = embedder.embed_one(text)
+        query_cache.put(text, embedding)
+        return embedding
     except Exception as e:
         st.error(f"Error generating embedding: {e}")
         return None
@@ -434,6 +448,20 @@ def is_new_hostel(hostel):
         return (datetime.now() - added_date).days <= 30
     return False
 
+# Results per page, and how many ranked candidates a search keeps for paging
+PAGE_SIZE = 10
+MAX_CANDIDATES = 200
+
+# Sort options: attribute field and direction (None keeps the relevance order)
+SORT_OPTIONS = {
+    "Best match": None,
+    "Price: low to high": ("monthly_rent", False),
+    "Price: high to low": ("monthly_rent", True),
+    "Rating": ("ratings", True),
+    "Most reviewed": ("reviews", True),
+    "Distance from college": ("distance_from_college", False),
+}
+
 # Sidebar filters
 with st.sidebar:
     st.markdown("""
@@ -480,6 +508,67 @@ with st.sidebar:
         label_visibility="collapsed"
     )
     st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+    st.markdown('<div class="sidebar-title">Gender</div>', unsafe_allow_html=True)
+    gender = st.selectbox(
+        "Gender",
+        ["Any", "Male", "Female"],
+        label_visibility="collapsed"
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+    st.markdown('<div class="sidebar-title">Max Distance from College</div>', unsafe_allow_html=True)
+    max_distance = st.slider(
+        "Max distance from college (km)",
+        min_value=0.5, max_value=20.0, value=20.0,
+        step=0.5,
+        label_visibility="collapsed"
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+    st.markdown('<div class="sidebar-title">Minimum Match</div>', unsafe_allow_html=True)
+    min_match = st.slider(
+        "Minimum match (%)",
+        min_value=0, max_value=95, value=0,
+        step=5,
+        label_visibility="collapsed"
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+    st.markdown('<div class="sidebar-title">Sort By</div>', unsafe_allow_html=True)
+    sort_by = st.selectbox(
+        "Sort by",
+        list(SORT_OPTIONS),
+        label_visibility="collapsed"
+    )
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Structured filters as keyword arguments for retrieval.filter_mask
+    # (the distance slider at its maximum means "any distance")
+    filters = dict(
+        ranges={
+            "monthly_rent": price_range,
+            "ratings": (float(min_rating), None),
+            "distance_from_college": (None, max_distance if max_distance < 20.0 else None),
+        },
+        any_of={
+            "room_types": room_types,
+            "facilities": facilities,
+            "gender": [gender] if gender != "Any" else [],
+        },
+    )
+    
+    # Facet counts straight from the in-memory attribute store (no database query)
+    if index is not None and search_index.attributes is not None:
+        matching = retrieval.filter_mask(search_index, **filters)
+        st.caption(f"{int(matching.sum())} hostels match these filters")
+        for field, title in (("gender", "By gender"), ("room_types", "By room type")):
+            counts = search_index.attributes.facet_counts(field, matching)
+            st.caption(title + ": " + ", ".join(f"{value.title()} ({count})" for value, count in counts.items() if count))
 
 # Main content
 st.markdown("""
@@ -507,171 +596,233 @@ with col2:
 
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Results section
+# A new search starts at the first page; Previous/Next move the offset
 if search_pressed:
+    st.session_state["search_active"] = True
+    st.session_state["search_offset"] = 0
+
+# Function to move to another page of the current results
+def go_to_offset(offset):
+    st.session_state["search_offset"] = offset
+
+# Results section
+if st.session_state.get("search_active"):
     if not query:
         st.warning("Please enter a search query to find hostels matching your preferences.")
     else:
         if not index or hostel_ids is None:
             st.error("Search index not available. Please try again later or contact support.")
-        elif hostel_collection is None:
+        elif hostel_collection is None and search_index.snapshot is None:
             st.error("Database connection not available. Please try again later or contact support.")
         else:
             with st.spinner("Finding the best hostels for you..."):
-                query_embedding = get_embedding(query)
-                if query_embedding is not None:
-                    query_embedding = query_embedding.reshape(1, -1)
-                    D, I = index.search(query_embedding, k=10)  # Get more results for filtering
-                    
-                    # Display results
-                    st.markdown('<div class="results-section">', unsafe_allow_html=True)
+                # Function to rank every candidate for this query and these filters. Returns
+                # (labels, scores, complete); keyword-only fallbacks are not complete.
+                def rank_candidates():
+                    query_embedding = get_embedding(query)
+                    # Without an embedding the keyword index still answers the query
+                    if query_embedding is None and search_index.lexical is None:
+                        return [], [], False
+                    if query_embedding is not None:
+                        query_embedding = query_embedding.reshape(1, -1)
+                    else:
+                        st.info("Showing keyword matches while semantic search is unavailable.")
+                    # Pre-filter on the stored attributes so every candidate is a matching hostel,
+                    # then fuse semantic (FAISS) and keyword (BM25) results by rank
+                    mask = retrieval.filter_mask(search_index, **filters)
+                    # A minimum match keeps only hostels within that similarity (0 = plain top-k)
+                    match_radius = retrieval.similarity_to_distance(min_match / 100) if min_match else None
+                    D, I = retrieval.hybrid_search(search_index, query, query_embedding, MAX_CANDIDATES, mask,
+                                                   max_distance=match_radius)
+                    labels, scores = I[0][I[0] != -1], D[0][I[0] != -1]
                     
-                    # Results header
+                    # Re-order the hits by the chosen attribute (stable, so ties stay in relevance order)
+                    if SORT_OPTIONS[sort_by] and search_index.attributes is not None and len(labels):
+                        field, descending = SORT_OPTIONS[sort_by]
+                        score_of = dict(zip(labels.tolist(), scores.tolist()))
+                        labels = labels[labels < len(search_index.attributes)]
+                        labels = search_index.attributes.sort_rows(labels, field, descending)
+                        scores = [score_of[label] for label in labels.tolist()]
+                    return labels, scores, query_embedding is not None
+                
+                key = session_key(search_index.version, query, filters=filters, min_match=min_match, sort_by=sort_by)
+                # Later pages reuse the stored ranking; degraded rankings are not stored
+                session = search_sessions.get(key)
+                if session is None:
+                    labels, scores, complete = rank_candidates()
+                    session = search_sessions.put(key, labels, scores) if complete else SearchSession(key, labels, scores)
+                offset = st.session_state.get("search_offset", 0)
+                if offset >= len(session):
+                    offset = 0
+                page_labels, _, next_cursor = session.page(offset, PAGE_SIZE)
+                
+                I = np.full((1, PAGE_SIZE), -1, dtype="int64")
+                I[0, :len(page_labels)] = page_labels
+                
+                # Display results
+                st.markdown('<div class="results-section">', unsafe_allow_html=True)
+                
+                # Results header
+                st.markdown("""
+                    <div class="results-header">
+                        <h2 class="results-title">Search Results</h2>
+                        <div class="results-count">Showing {first}-{last} of {total} hostels</div>
+                    </div>
+                """.format(first=offset + 1 if len(page_labels) else 0, last=offset + len(page_labels),
+                           total=len(session)), unsafe_allow_html=True)
+                
+                if I[0][0] == -1 or all(i == -1 for i in I[0]):
                     st.markdown("""
-                        <div class="results-header">
-                            <h2 class="results-title">Search Results</h2>
-                            <div class="results-count">Showing {count} hostels</div>
+                        <div class="no-results">
+                            <div class="no-results-icon">🏠</div>
+                            <h3>No matching hostels found</h3>
+                            <p>Try adjusting your search criteria or filters</p>
                         </div>
-                    """.format(count=len(I[0]) if I[0][0] != -1 else 0), unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
+                else:
+                    found_results = 0
                     
-                    if I[0][0] == -1 or all(i == -1 for i in I[0]):
+                    # Load the hits in rank order from the index snapshot (MongoDB only for what it lacks)
+                    hits = [i for i in I[0] if i != -1 and 0 <= i < len(hostel_ids)]
+                    hostels, _ = hydration.hydrate_labels(search_index, hostel_collection, hits,
+                                                            cache=document_cache)
+                    for hostel in hostels:
+                        # Apply filters (still needed for builds without stored attributes)
+                        hostel_rent = hostel.get('monthly_rent', 0)
+                        if not (price_range[0] <= hostel_rent <= price_range[1]):
+                            continue
+                                
+                        hostel_rating = float(hostel.get('ratings', 0))
+                        if hostel_rating < float(min_rating):
+                            continue
+                                
+                        if gender != "Any" and str(hostel.get('gender', '')).lower() != gender.lower():
+                            continue
+                                
+                        if max_distance < 20.0 and not float(hostel.get('distance_from_college', float('inf'))) <= max_distance:
+                            continue
+                                
+                        if room_types:
+                            hostel_rooms = hostel.get('room_types', [])
+                            if not any(room.lower() in [r.lower() for r in hostel_rooms] for room in room_types):
+                                continue
+                                
+                        if facilities:
+                            hostel_facilities = hostel.get('facilities', [])
+                            if not any(facility.lower() in [f.lower() for f in hostel_facilities] for facility in facilities):
+                                continue
+                                
+                        found_results += 1
+                                
+                        # Prepare hostel data
+                        hostel_name = escape_html(hostel.get('name', 'Unknown Hostel'))
+                        hostel_location = escape_html(hostel.get('location', 'Location not specified'))
+                        hostel_rent = escape_html(hostel.get('monthly_rent', 'N/A'))
+                        hostel_description = escape_html(hostel.get('description', 'No description available'))
+                        rating_display = render_stars(hostel.get('ratings', '0'))
+                        is_new = is_new_hostel(hostel)
+                                
+                        # Display hostel card
+                        st.markdown(f"""
+                            <div class='hostel-card'>
+                                <div class='hostel-header'>
+                                    <div>
+                                        <h3 class='hostel-name'>
+                                            {hostel_name}
+                                            {f'<span class="new-badge">NEW</span>' if is_new else ''}
+                                        </h3>
+                                        <div class='hostel-location'>
+                                            📍 {hostel_location}
+                                        </div>
+                                    </div>
+                                    <div class='hostel-price'>
+                                        ₹{hostel_rent}/mo
+                                    </div>
+                                </div>
+                                        
+                                <div class='hostel-rating'>
+                                    <span class="star-filled">★</span>
+                                    {rating_display} ({hostel.get('ratings', '0')})
+                                </div>
+                                        
+                                <div class='hostel-description'>
+                                    {hostel_description}
+                                </div>
+                                        
+                                <div class='section-title'>Room Types</div>
+                                <div class='tags-container'>
+                        """, unsafe_allow_html=True)
+                                
+                        # Display room types
+                        if hostel.get('room_types'):
+                            for room in hostel['room_types']:
+                                st.markdown(f"""
+                                    <div class='tag room-tag'>
+                                        🛏️ {escape_html(room)}
+                                    </div>
+                                """, unsafe_allow_html=True)
+                                
                         st.markdown("""
-                            <div class="no-results">
-                                <div class="no-results-icon">🏠</div>
-                                <h3>No matching hostels found</h3>
-                                <p>Try adjusting your search criteria or filters</p>
-                            </div>
+                                </div>
+                                        
+                                <div class='section-title'>Amenities</div>
+                                <div class='amenities-grid'>
                         """, unsafe_allow_html=True)
-                    else:
-                        found_results = 0
-                        
-                        for i in I[0]:
-                            if i != -1 and 0 <= i < len(hostel_ids):
-                                hostel_id = hostel_ids[i]
-                                hostel = hostel_collection.find_one({"_id": ObjectId(hostel_id)})
                                 
-                                if hostel:
-                                    # Apply filters
-                                    hostel_rent = hostel.get('monthly_rent', 0)
-                                    if not (price_range[0] <= hostel_rent <= price_range[1]):
-                                        continue
-                                    
-                                    hostel_rating = float(hostel.get('ratings', 0))
-                                    if hostel_rating < float(min_rating):
-                                        continue
-                                    
-                                    if room_types:
-                                        hostel_rooms = hostel.get('room_types', [])
-                                        if not any(room.lower() in [r.lower() for r in hostel_rooms] for room in room_types):
-                                            continue
-                                    
-                                    if facilities:
-                                        hostel_facilities = hostel.get('facilities', [])
-                                        if not any(facility.lower() in [f.lower() for f in hostel_facilities] for facility in facilities):
-                                            continue
-                                    
-                                    found_results += 1
-                                    
-                                    # Prepare hostel data
-                                    hostel_name = escape_html(hostel.get('name', 'Unknown Hostel'))
-                                    hostel_location = escape_html(hostel.get('location', 'Location not specified'))
-                                    hostel_rent = escape_html(hostel.get('monthly_rent', 'N/A'))
-                                    hostel_description = escape_html(hostel.get('description', 'No description available'))
-                                    rating_display = render_stars(hostel.get('ratings', '0'))
-                                    is_new = is_new_hostel(hostel)
-                                    
-                                    # Display hostel card
-                                    st.markdown(f"""
-                                        <div class='hostel-card'>
-                                            <div class='hostel-header'>
-                                                <div>
-                                                    <h3 class='hostel-name'>
-                                                        {hostel_name}
-                                                        {f'<span class="new-badge">NEW</span>' if is_new else ''}
-                                                    </h3>
-                                                    <div class='hostel-location'>
-                                                        📍 {hostel_location}
-                                                    </div>
-                                                </div>
-                                                <div class='hostel-price'>
-                                                    ₹{hostel_rent}/mo
-                                                </div>
-                                            </div>
-                                            
-                                            <div class='hostel-rating'>
-                                                <span class="star-filled">★</span>
-                                                {rating_display} ({hostel.get('ratings', '0')})
-                                            </div>
-                                            
-                                            <div class='hostel-description'>
-                                                {hostel_description}
-                                            </div>
-                                            
-                                            <div class='section-title'>Room Types</div>
-                                            <div class='tags-container'>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    # Display room types
-                                    if hostel.get('room_types'):
-                                        for room in hostel['room_types']:
-                                            st.markdown(f"""
-                                                <div class='tag room-tag'>
-                                                    🛏️ {escape_html(room)}
-                                                </div>
-                                            """, unsafe_allow_html=True)
-                                    
-                                    st.markdown("""
-                                            </div>
-                                            
-                                            <div class='section-title'>Amenities</div>
-                                            <div class='amenities-grid'>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    # Display amenities in a grid
-                                    if hostel.get('facilities'):
-                                        for facility in hostel['facilities'][:8]:  # Limit to 8 amenities
-                                            st.markdown(f"""
-                                                <div class='amenity-item'>
-                                                    ✅ {escape_html(facility)}
-                                                </div>
-                                            """, unsafe_allow_html=True)
-                                    
-                                    st.markdown("""
-                                            </div>
-                                            
-                                            <div class='section-title'>Contact Information</div>
-                                            <div class='contact-section'>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    # Contact information
-                                    contact_phone = escape_html(hostel.get('contact', {}).get('phone', 'Not provided'))
-                                    contact_email = escape_html(hostel.get('contact', {}).get('email', 'Not provided'))
-                                    
-                                    st.markdown(f"""
-                                                <div class='contact-item'>
-                                                    📞 {contact_phone}
-                                                </div>
-                                                <div class='contact-item'>
-                                                    ✉️ {contact_email}
-                                                </div>
-                                            </div>
-                                        </div>
-                                    """, unsafe_allow_html=True)
-                        
-                        if found_results == 0:
-                            st.markdown("""
-                                <div class="no-results">
-                                    <div class="no-results-icon">🔍</div>
-                                    <h3>No hostels match your filters</h3>
-                                    <p>Try adjusting your filter criteria</p>
+                        # Display amenities in a grid
+                        if hostel.get('facilities'):
+                            for facility in hostel['facilities'][:8]:  # Limit to 8 amenities
+                                st.markdown(f"""
+                                    <div class='amenity-item'>
+                                        ✅ {escape_html(facility)}
+                                    </div>
+                                """, unsafe_allow_html=True)
+                                
+                        st.markdown("""
+                                </div>
+                                        
+                                <div class='section-title'>Contact Information</div>
+                                <div class='contact-section'>
+                        """, unsafe_allow_html=True)
+                                
+                        # Contact information
+                        contact_phone = escape_html(hostel.get('contact', {}).get('phone', 'Not provided'))
+                        contact_email = escape_html(hostel.get('contact', {}).get('email', 'Not provided'))
+                                
+                        st.markdown(f"""
+                                    <div class='contact-item'>
+                                        📞 {contact_phone}
+                                    </div>
+                                    <div class='contact-item'>
+                                        ✉️ {contact_email}
+                                    </div>
                                 </div>
-                            """, unsafe_allow_html=True)
+                            </div>
+                        """, unsafe_allow_html=True)
                     
-                    st.markdown('</div>', unsafe_allow_html=True)
+                    if found_results == 0:
+                        st.markdown("""
+                            <div class="no-results">
+                                <div class="no-results-icon">🔍</div>
+                                <h3>No hostels match your filters</h3>
+                                <p>Try adjusting your filter criteria</p>
+                            </div>
+                        """, unsafe_allow_html=True)
+                
+                # Pagination: each page only fetches its own hostels from the stored ranking
+                prev_col, next_col = st.columns(2)
+                with prev_col:
+                    st.button("← Previous", disabled=offset == 0, on_click=go_to_offset,
+                              args=(max(0, offset - PAGE_SIZE),))
+                with next_col:
+                    st.button("Next →", disabled=next_cursor is None, on_click=go_to_offset,
+                              args=(decode_cursor(next_cursor)[1] if next_cursor else offset,))
+                
+                st.markdown('</div>', unsafe_allow_html=True)
 
 # Featured hostels section when no search is performed
 # Featured hostels section when no search is performed
-if not search_pressed:
+if not st.session_state.get("search_active"):
     st.markdown("""
         <style>
             .featured-title {
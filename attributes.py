@@ -0,0 +1,197 @@
+import numpy as np
+from ingest import iter_hostel_chunks, DEFAULT_CHUNK_SIZE
+
+# Structured fields kept next to the index, one row per FAISS label
+NUMERIC_FIELDS = ("monthly_rent", "ratings", "reviews", "distance_from_college")
+CATEGORY_FIELDS = ("gender",)
+TAG_FIELDS = ("facilities", "room_types")
+ATTRIBUTE_FIELDS = {field: 1 for field in NUMERIC_FIELDS + CATEGORY_FIELDS + TAG_FIELDS}
+
+# Value stored when a numeric field is missing. Rent, rating and reviews count as 0
+# (like the app's .get(..., 0)); an unknown distance is NaN so it never passes a
+# distance filter and sorts last.
+MISSING_NUMBERS = {"distance_from_college": np.nan}
+
+# Function to read a number from a document value (None/bad values become `default`)
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+# Function to normalize a category/tag value for its dictionary (case-insensitive)
+def _key(value):
+    return str(value).strip().lower()
+
+# Structured hostel attributes aligned with index labels, stored column by column:
+# a float32 array per numeric field, an int16 dictionary code per category field
+# (-1 = missing) and, per tag field, a (rows, words) uint64 bitset over a dictionary
+# of lower-cased values. Filters, sorts and facet counts are vectorized array
+# operations, so none of them needs a MongoDB round trip.
+class AttributeStore:
+    def __init__(self, numeric, tags, vocab, categories=None):
+        self.numeric = numeric
+        self.categories = categories if categories is not None else {}
+        self.tags = tags
+        self.vocab = vocab
+        self._bit_of = {field: {value: bit for bit, value in enumerate(values)} for field, values in vocab.items()}
+
+    @classmethod
+    def empty(cls, rows):
+        numeric = {field: np.full(rows, MISSING_NUMBERS.get(field, 0.0), dtype=np.float32) for field in NUMERIC_FIELDS}
+        categories = {field: np.full(rows, -1, dtype=np.int16) for field in CATEGORY_FIELDS}
+        tags = {field: np.zeros((rows, 1), dtype=np.uint64) for field in TAG_FIELDS}
+        return cls(numeric, tags, {field: [] for field in CATEGORY_FIELDS + TAG_FIELDS}, categories)
+
+    def __len__(self):
+        return len(next(iter(self.numeric.values())))
+
+    @property
+    def nbytes(self):
+        columns = list(self.numeric.values()) + list(self.categories.values()) + list(self.tags.values())
+        return sum(column.nbytes for column in columns)
+
+    # Function to grow the store to `rows` rows (new labels from the updater)
+    def resize(self, rows):
+        extra = rows - len(self)
+        if extra <= 0:
+            return
+        for field, values in self.numeric.items():
+            self.numeric[field] = np.concatenate([values, np.full(extra, MISSING_NUMBERS.get(field, 0.0), dtype=values.dtype)])
+        for field, codes in self.categories.items():
+            self.categories[field] = np.concatenate([codes, np.full(extra, -1, dtype=codes.dtype)])
+        for field, bits in self.tags.items():
+            self.tags[field] = np.concatenate([bits, np.zeros((extra, bits.shape[1]), dtype=np.uint64)])
+
+    # Function to get the dictionary code (tag bit position) of a value, adding it if new
+    def _code(self, field, value):
+        value = _key(value)
+        bit_of = self._bit_of[field]
+        if value not in bit_of:
+            bit_of[value] = len(self.vocab[field])
+            self.vocab[field].append(value)
+            bits = self.tags.get(field)
+            if bits is not None and (len(bit_of) + 63) // 64 > bits.shape[1]:
+                self.tags[field] = np.concatenate([bits, np.zeros((len(bits), 1), dtype=np.uint64)], axis=1)
+        return bit_of[value]
+
+    # Function to write the attributes of hostel documents into the rows of their labels
+    def set_rows(self, labels, hostels):
+        self.resize(int(max(labels)) + 1 if len(labels) else 0)
+        for label, hostel in zip(labels, hostels):
+            for field in self.numeric:
+                self.numeric[field][label] = _to_float(hostel.get(field), MISSING_NUMBERS.get(field, 0.0))
+            for field in self.categories:
+                value = hostel.get(field)
+                self.categories[field][label] = self._code(field, value) if value else -1
+            for field in self.tags:
+                self.tags[field][label] = 0
+                for value in hostel.get(field) or []:
+                    bit = self._code(field, value)
+                    self.tags[field][label, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    # Function to reset the rows of deleted hostels
+    def clear_rows(self, labels):
+        for field, values in self.numeric.items():
+            values[labels] = MISSING_NUMBERS.get(field, 0.0)
+        for codes in self.categories.values():
+            codes[labels] = -1
+        for bits in self.tags.values():
+            bits[labels] = 0
+
+    # Function to get the rows whose category is one of `values`, or that have at
+    # least one of `values` in a tag field (case-insensitive)
+    def any_of(self, field, values):
+        bit_of = self._bit_of[field]
+        if field in self.categories:
+            codes = [bit_of[_key(value)] for value in values if _key(value) in bit_of]
+            return np.isin(self.categories[field], codes)
+        bits = self.tags[field]
+        query = np.zeros(bits.shape[1], dtype=np.uint64)
+        for value in values:
+            bit = bit_of.get(str(value).strip().lower())
+            if bit is not None:
+                query[bit // 64] |= np.uint64(1 << (bit % 64))
+        return (bits & query).any(axis=1)
+
+    # Function to build a boolean row mask from structured constraints:
+    # ranges = {field: (low, high)} (either bound may be None),
+    # any_of = {category or tag field: [values]}
+    def mask(self, ranges=None, any_of=None):
+        mask = np.ones(len(self), dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            values = self.numeric[field]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for field, values in (any_of or {}).items():
+            if values:
+                mask &= self.any_of(field, values)
+        return mask
+
+    # Function to order rows (e.g. search hits) by a numeric field. The sort is
+    # stable, so ties keep their incoming (relevance) order; NaN sorts last.
+    def sort_rows(self, rows, field, descending=False):
+        rows = np.asarray(rows, dtype=np.int64)
+        values = self.numeric[field][rows]
+        order = np.argsort(-values if descending else values, kind="stable")
+        return rows[order]
+
+    # Function to count rows per value of a category or tag field, optionally
+    # within a mask. Returns {value: count} in dictionary order.
+    def facet_counts(self, field, mask=None):
+        vocab = self.vocab[field]
+        if field in self.categories:
+            codes = self.categories[field] if mask is None else self.categories[field][mask]
+            counts = np.bincount(codes[codes >= 0], minlength=len(vocab))
+        else:
+            bits = self.tags[field] if mask is None else self.tags[field][mask]
+            counts = [int(np.count_nonzero(bits[:, bit // 64] & np.uint64(1 << (bit % 64))))
+                      for bit in range(len(vocab))]
+        return {value: int(count) for value, count in zip(vocab, counts)}
+
+    # Function to count rows per bucket of a numeric field (edges as for np.histogram)
+    def range_counts(self, field, edges, mask=None):
+        values = self.numeric[field] if mask is None else self.numeric[field][mask]
+        counts, _ = np.histogram(values[~np.isnan(values)], bins=edges)
+        return [int(count) for count in counts]
+
+    def save(self, path):
+        arrays = {}
+        for field, values in self.numeric.items():
+            arrays[f"num:{field}"] = values
+        for field, codes in self.categories.items():
+            arrays[f"cat:{field}"] = codes
+            arrays[f"vocab:{field}"] = np.array(self.vocab[field], dtype=str)
+        for field, bits in self.tags.items():
+            arrays[f"tag:{field}"] = bits
+            arrays[f"vocab:{field}"] = np.array(self.vocab[field], dtype=str)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        numeric, categories, tags, vocab = {}, {}, {}, {}
+        with np.load(path) as data:
+            for key in data.files:
+                kind, field = key.split(":", 1)
+                if kind == "num":
+                    numeric[field] = data[key]
+                elif kind == "cat":
+                    categories[field] = data[key]
+                elif kind == "tag":
+                    tags[field] = data[key]
+                elif kind == "vocab":
+                    vocab[field] = [str(value) for value in data[key]]
+        return cls(numeric, tags, vocab, categories)
+
+# Function to read the structured fields of every indexed hostel from MongoDB
+# (streamed with a projected cursor) into a store aligned with `id_map` labels
+def build_attributes(collection, id_map, chunk_size=DEFAULT_CHUNK_SIZE):
+    store = AttributeStore.empty(len(id_map))
+    for hostels in iter_hostel_chunks(collection, chunk_size, projection=ATTRIBUTE_FIELDS):
+        labels = id_map.labels_for([hostel["_id"] for hostel in hostels])
+        indexed = labels != -1
+        store.set_rows(labels[indexed], [hostel for hostel, ok in zip(hostels, indexed) if ok])
+    return store
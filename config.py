@@ -5,3 +5,9 @@ MONGO_URI = st.secrets["MONGO_URI"]
 DB_NAME = st.secrets["DB_NAME"]
 COLLECTION_NAME = st.secrets["COLLECTION_NAME"]
 GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
+
+# Which embedder to use for queries ("gemini" or the local "hashing" backend)
+EMBEDDER = st.secrets.get("EMBEDDER", "gemini")
+
+# Memory-map the index and IDs instead of reading them into each process
+INDEX_MMAP = str(st.secrets.get("INDEX_MMAP", "true")).lower() == "true"
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+import bson
+from pymongo.errors import OperationFailure, PyMongoError
+from ingest import latest_watermark, find_edited_since
+
+# Memory budget for all cached hostel documents together (measured as BSON)
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Upper bound on staleness for edits that neither reach the change stream nor touch updated_at
+DEFAULT_TTL_SECONDS = 600
+# How often hydration asks MongoDB for hostels edited since the last check
+# (only while no change stream is followed)
+DEFAULT_CHECK_SECONDS = 5.0
+# Invalidations remembered for fetches still in flight; older fetches are not cached
+DEFAULT_TRACKED_INVALIDATIONS = 10000
+
+# Process-wide LRU cache of projected hostel documents keyed by _id, sitting in
+# front of the $in hydration so popular hostels are served from memory. Entries
+# are evicted by their BSON size. Edits show up promptly: `follow()` listens to
+# the collection's change stream and drops every changed or deleted hostel;
+# without change streams, `check_updates()` drops hostels whose updated_at moved
+# past the newest one seen. Every invalidation bumps a generation counter: a
+# fetch records it before querying, and put_many skips hostels invalidated after
+# that, so a document read before an edit is never cached after its invalidation.
+# One instance is shared by every Streamlit session, so access is locked.
+class DocumentCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 check_seconds=DEFAULT_CHECK_SECONDS, tracked_invalidations=DEFAULT_TRACKED_INVALIDATIONS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self.tracked_invalidations = tracked_invalidations
+        self.following = False
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Generation of the latest invalidation of each hostel, oldest first
+        self._invalidated = OrderedDict()
+        # Invalidations up to this generation are no longer tracked
+        self._forgotten = 0
+        self._last_check = None
+        self._watermark = (None, set())
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # Function to get the cached documents of many hostels: {ObjectId: document}.
+    # An entry only counts if it was fetched with every field in `fields`
+    # (None = whole documents).
+    def get_many(self, hostel_ids, fields=None):
+        wanted = frozenset(fields) if fields is not None else None
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for hostel_id in hostel_ids:
+                entry = self._entries.get(hostel_id)
+                if entry is not None and now - entry[0] > self.ttl_seconds:
+                    self._drop(hostel_id)
+                    entry = None
+                if entry is not None and (entry[1] is None or (wanted is not None and wanted <= entry[1])):
+                    self._entries.move_to_end(hostel_id)
+                    found[hostel_id] = entry[2]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    # Generation to record before fetching documents that will be passed to put_many
+    @property
+    def generation(self):
+        return self._generation
+
+    # Function to store documents fetched with projection `fields`, evicting the
+    # least recently used ones over the budget. With the `generation` read before
+    # the fetch, hostels invalidated since then are left out.
+    def put_many(self, hostels, fields=None, generation=None):
+        fields = frozenset(fields) if fields is not None else None
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation < self._forgotten:
+                return
+            for hostel in hostels:
+                if generation is not None and self._invalidated.get(hostel["_id"], 0) > generation:
+                    continue
+                size = len(bson.encode(hostel))
+                if hostel["_id"] in self._entries:
+                    self._drop(hostel["_id"])
+                self._entries[hostel["_id"]] = (now, fields, hostel, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    # Function to forget hostels that changed
+    def invalidate(self, hostel_ids):
+        with self._lock:
+            self._generation += 1
+            for hostel_id in hostel_ids:
+                self._invalidated.pop(hostel_id, None)
+                self._invalidated[hostel_id] = self._generation
+                if hostel_id in self._entries:
+                    self._drop(hostel_id)
+                    self.invalidations += 1
+            while len(self._invalidated) > self.tracked_invalidations:
+                self._forgotten = self._invalidated.popitem(last=False)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            # Fetches already in flight may hold documents from before the clear
+            self._generation += 1
+            self._invalidated.clear()
+            self._forgotten = self._generation
+
+    def _drop(self, hostel_id):
+        self._bytes -= self._entries.pop(hostel_id)[3]
+
+    # Function to drop hostels edited since the last check (by updated_at). Runs
+    # at most every check_seconds and not at all while a change stream is
+    # followed; a failed check keeps serving the cache (it is retried next time).
+    def check_updates(self, collection):
+        now = time.monotonic()
+        if self.following or (self._last_check is not None and now - self._last_check < self.check_seconds):
+            return
+        first_check, self._last_check = self._last_check is None, now
+        try:
+            if first_check:
+                # Edits before the first check predate every cached document
+                self._watermark = latest_watermark(collection)
+                return
+            changed, self._watermark = find_edited_since(collection, self._watermark, projection={"updated_at": 1})
+        except PyMongoError as e:
+            print(f"⚠️ Could not check for edited hostels, serving cached documents: {e}")
+            return
+        if changed:
+            self.invalidate([hostel["_id"] for hostel in changed])
+
+    # Function to follow the collection's change stream in a background thread and
+    # drop every hostel it reports. Returns at once; without change streams
+    # (standalone servers) the cache keeps relying on check_updates.
+    def follow(self, collection, retry_seconds=30.0):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._follow, args=(collection, retry_seconds),
+                                            name="document-cache-watcher", daemon=True)
+            self._thread.start()
+
+    def _follow(self, collection, retry_seconds):
+        while True:
+            try:
+                with collection.watch([{"$project": {"documentKey": 1}}]) as stream:
+                    # Edits made while nobody was listening are unknown
+                    self.clear()
+                    self.following = True
+                    print("👀 Document cache following the hostel change stream")
+                    for event in stream:
+                        if "documentKey" in event:
+                            self.invalidate([event["documentKey"]["_id"]])
+                        else:
+                            # drop, rename or invalidate: any cached hostel may be gone
+                            self.clear()
+            except OperationFailure as e:
+                print(f"⚠️ Change streams not available ({e}), document cache falls back to updated_at checks")
+                return
+            except PyMongoError as e:
+                print(f"⚠️ Document cache lost the change stream ({e}), retrying in {retry_seconds}s")
+            finally:
+                # Whatever stopped the stream, updated_at checks cover the gap
+                self.following = False
+            time.sleep(retry_seconds)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "documents": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "following": self.following,
+            }
@@ -0,0 +1,88 @@
+import hashlib
+import re
+import google.generativeai as genai
+import numpy as np
+
+# Base class for everything that turns text into vectors. The index records
+# name/model/dim from describe() so a mismatched embedder is caught at load time.
+class Embedder:
+    name = "base"
+    model = None
+    dim = None
+
+    # Function to embed a list of texts, returns a (len(texts), dim) float32 array
+    def embed(self, texts, task_type="retrieval_document"):
+        raise NotImplementedError
+
+    # Function to embed a single text
+    def embed_one(self, text, task_type="retrieval_document"):
+        return self.embed([text], task_type)[0]
+
+    def describe(self):
+        return {"embedder": self.name, "model": self.model, "dim": self.dim}
+
+# Gemini embedding API (network call per request)
+class GeminiEmbedder(Embedder):
+    name = "gemini"
+
+    def __init__(self, model="models/embedding-001", dim=768, api_key=None):
+        self.model = model
+        self.dim = dim
+        if api_key:
+            genai.configure(api_key=api_key)
+
+    def embed(self, texts, task_type="retrieval_document"):
+        # A list of texts goes through batchEmbedContents in one request
+        response = genai.embed_content(
+            model=self.model,
+            content=list(texts),
+            task_type=task_type
+        )
+        return np.array(response["embedding"], dtype="float32").reshape(len(texts), -1)
+
+    def embed_one(self, text, task_type="retrieval_document"):
+        response = genai.embed_content(
+            model=self.model,
+            content=text,
+            task_type=task_type
+        )
+        return np.array(response["embedding"], dtype="float32")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Fully local CPU embedder: signed feature hashing of word unigrams and bigrams,
+# log-scaled and L2-normalized. No network, no model files, deterministic across runs.
+class HashingEmbedder(Embedder):
+    name = "hashing"
+
+    def __init__(self, dim=768):
+        self.dim = dim
+        self.model = f"hashing-uni-bigram-{dim}"
+
+    def _features(self, text):
+        tokens = _TOKEN.findall(str(text).lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts, task_type="retrieval_document"):
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+EMBEDDERS = {
+    "gemini": GeminiEmbedder,
+    "hashing": HashingEmbedder,
+}
+
+# Function to create an embedder by name ("gemini" or "hashing").
+# api_key is only used by the Gemini backend.
+def get_embedder(name="gemini", api_key=None, **options):
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected one of: {', '.join(EMBEDDERS)}")
+    if name == "gemini":
+        options["api_key"] = api_key
+    return EMBEDDERS[name](**options)
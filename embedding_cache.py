@@ -0,0 +1,62 @@
+import hashlib
+import sqlite3
+import numpy as np
+
+DEFAULT_CACHE_PATH = "embedding_cache.sqlite3"
+
+# Function to build the content address of an embedding
+def cache_key(model, task_type, text):
+    payload = "\x1f".join([model, task_type, text]).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+# On-disk embedding cache keyed by hash(model, task_type, text), so a rebuild
+# only has to embed hostels whose formatted text is new or has changed
+class EmbeddingCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    # Function to look up many keys at once; returns {key: vector} for the hits
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        # Stay under SQLite's limit on bound parameters per statement
+        for offset in range(0, len(keys), 500):
+            chunk = keys[offset:offset + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            )
+            for key, dim, blob in rows:
+                vector = np.frombuffer(blob, dtype="float32")
+                if vector.shape[0] == dim:
+                    found[key] = vector
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    # Function to store {key: vector} pairs
+    def put_many(self, items):
+        rows = [
+            (key, int(np.asarray(vector).shape[0]), np.asarray(vector, dtype="float32").tobytes())
+            for key, vector in items.items()
+        ]
+        self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate(), 4)}
+
+    def close(self):
+        self.conn.close()
@@ -1,62 +1,271 @@
-import google.generativeai as genai
-import faiss
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from pymongo import MongoClient
-from bson import ObjectId
-import config 
-
-# Configure Gemini API
-genai.configure(api_key=config.GEMINI_API_KEY)  # Use env variable instead of hardcoding
-
-# Function to generate embeddings
-def get_embedding(text):
-    response = genai.embed_content(
-        model="models/embedding-001",
-        content=text,
-        task_type="retrieval_document"
-    )
-    return np.array(response["embedding"], dtype="float32")
-
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hostelDB"]
-hostel_collection = db["hostels"]
-
-# Fetch hostel data
-hostels = list(hostel_collection.find({}))
-
-# Debugging: Check if data exists
-if not hostels:
-    print("❌ No hostel data found in the database. Did you run db.py?")
-    exit()
-
-# Store MongoDB IDs alongside embeddings
-hostel_ids = []
-hostel_embeddings = []
-
-for hostel in hostels:
-    formatted_text = f"{hostel['name']} in {hostel['location']}. {hostel['description']} Facilities: {', '.join(hostel['facilities'])}. Room Types: {', '.join(hostel['room_types'])}. Rent: {hostel['monthly_rent']} INR. Gender: {hostel['gender']}."
-    
-    try:
-        embedding = get_embedding(formatted_text)
-        hostel_embeddings.append(embedding)
-        hostel_ids.append(str(hostel["_id"]))  # Store _id as string
-    except Exception as e:
-        print(f"⚠️ Failed to generate embedding for {hostel['name']}: {e}")
-
-# Convert embeddings to NumPy array
-if not hostel_embeddings:
-    print("❌ No embeddings generated. Check your Gemini API setup.")
-    exit()
-
-hostel_embeddings = np.array(hostel_embeddings, dtype="float32")
-
-# Create FAISS index
-index = faiss.IndexFlatL2(hostel_embeddings.shape[1])
-index.add(hostel_embeddings)
-
-# Save FAISS index and hostel_ids
-faiss.write_index(index, "hostel_index.faiss")
-np.save("hostel_ids.npy", np.array(hostel_ids))
-
-print(f"✅ Stored embeddings for {len(hostels)} hostels.")
+import attributes
+import config
+import index_builder
+import index_report
+import lexical_index
+import sharding
+import snapshot
+import index_store
+from embedder import get_embedder, EMBEDDERS
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH, cache_key
+from ingest import BuildCheckpoint, iter_hostel_chunks, DEFAULT_CHUNK_SIZE, DEFAULT_CHECKPOINT_DIR
+from rate_limit import TokenBucket, call_with_retries
+from vector_store import VectorStore
+
+TASK_TYPE = "retrieval_document"
+# batchEmbedContents accepts at most 100 texts per request
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 4
+# Set to the embedding quota of the API key (requests per minute)
+DEFAULT_REQUESTS_PER_MINUTE = 1500
+DEFAULT_MAX_RETRIES = 5
+
+# Function to build the text that gets embedded for a hostel
+def format_hostel(hostel):
+    return f"{hostel['name']} in {hostel['location']}. {hostel['description']} Facilities: {', '.join(hostel['facilities'])}. Room Types: {', '.join(hostel['room_types'])}. Rent: {hostel['monthly_rent']} INR. Gender: {hostel['gender']}."
+
+# Function to get the token bucket that keeps requests within the API quota
+# (None = no limit). Share one per run: a new bucket starts with a full burst.
+def quota_limiter(requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE):
+    return TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+
+# Function to embed texts in batches on a pool of worker threads. Every request
+# waits on a token bucket sized to the API quota (`limiter`, shared by every call
+# of a run; without one a bucket for this call is made from requests_per_minute)
+# and transient errors (429/5xx) are retried with exponential backoff. If a batch still fails, its items are
+# retried one at a time so a single bad document doesn't lose the rest.
+# Returns one vector (or None if it still failed) per text, the errors by
+# position, and run stats.
+def embed_in_batches(texts, embedder, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                     requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES, limiter=None):
+    start = time.perf_counter()
+    vectors = [None] * len(texts)
+    errors = {}
+    limiter = limiter if limiter is not None else quota_limiter(requests_per_minute)
+    offsets = range(0, len(texts), batch_size)
+
+    def run_batch(offset):
+        chunk = texts[offset:offset + batch_size]
+        try:
+            chunk_vectors = call_with_retries(embedder.embed, chunk, TASK_TYPE,
+                                              limiter=limiter, max_retries=max_retries)
+            if len(chunk_vectors) != len(chunk):
+                raise ValueError(f"expected {len(chunk)} embeddings, got {len(chunk_vectors)}")
+            return offset, [np.asarray(vector, dtype="float32") for vector in chunk_vectors], {}
+        except Exception as batch_error:
+            print(f"⚠️ Batch at {offset} failed ({batch_error}), retrying its {len(chunk)} items individually")
+            chunk_vectors, chunk_errors = [], {}
+            for i, text in enumerate(chunk):
+                try:
+                    chunk_vectors.append(call_with_retries(embedder.embed_one, text, TASK_TYPE,
+                                                           limiter=limiter, max_retries=max_retries))
+                except Exception as e:
+                    chunk_vectors.append(None)
+                    chunk_errors[offset + i] = e
+            return offset, chunk_vectors, chunk_errors
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for offset, chunk_vectors, chunk_errors in pool.map(run_batch, offsets):
+            vectors[offset:offset + len(chunk_vectors)] = chunk_vectors
+            errors.update(chunk_errors)
+
+    elapsed = time.perf_counter() - start
+    embedded = len(texts) - len(errors)
+    stats = {
+        "documents": len(texts),
+        "embedded": embedded,
+        "failed": len(errors),
+        "batches": len(offsets),
+        "workers": workers,
+        "seconds": round(elapsed, 2),
+        "docs_per_sec": round(embedded / elapsed, 2) if elapsed > 0 else float(embedded),
+    }
+    return vectors, errors, stats
+
+# Function to embed texts through the on-disk cache: only texts whose
+# (model, task_type, text) hash is not cached yet are sent to the embedder
+def embed_with_cache(texts, cache, embedder, **batch_options):
+    keys = [cache_key(embedder.model, TASK_TYPE, text) for text in texts]
+    cached = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+
+    new_vectors, new_errors, stats = embed_in_batches([texts[i] for i in missing], embedder, **batch_options)
+    cache.put_many({keys[i]: vector for i, vector in zip(missing, new_vectors) if vector is not None})
+
+    vectors = [cached.get(key) for key in keys]
+    for i, vector in zip(missing, new_vectors):
+        vectors[i] = vector
+    errors = {missing[j]: e for j, e in new_errors.items()}
+    stats.update(cache.stats())
+    return vectors, errors, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed all hostels and build the FAISS index")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="number of hostels sent per embedding request")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file of previously computed embeddings")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="embed every hostel again, ignoring the cache")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="number of embedding requests kept in flight")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="embedding requests per minute allowed by the API quota (0 = unlimited)")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="retries with exponential backoff on 429/5xx errors")
+    parser.add_argument("--allow-partial", action="store_true",
+                        help="write the index even if some hostels could not be embedded")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="hostels read from MongoDB and added to the index per step")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR,
+                        help="write-ahead log used to resume an interrupted build")
+    parser.add_argument("--index", default="flat",
+                        help=f"index preset ({', '.join(index_builder.INDEX_PRESETS)}) or a FAISS factory string, e.g. IVF1024,Flat")
+    parser.add_argument("--train-size", type=int, default=None,
+                        help="number of vectors sampled to train IVF/PQ indexes (default: automatic)")
+    parser.add_argument("--nprobe", type=int, default=index_builder.DEFAULT_NPROBE,
+                        help="IVF lists scanned per query, saved with the index")
+    parser.add_argument("--ef-search", type=int, default=index_builder.DEFAULT_EF_SEARCH,
+                        help="HNSW search depth, saved with the index")
+    parser.add_argument("--shard-by-location", action="store_true",
+                        help="also build one index shard per city, so city searches scan only their shard")
+    parser.add_argument("--min-shard-size", type=int, default=sharding.DEFAULT_MIN_SHARD_SIZE,
+                        help="cities with fewer hostels than this share the 'other' shard")
+    parser.add_argument("--rerank-vectors", default="auto", choices=("auto", "float32", "float16", "none"),
+                        help="keep full-precision vectors to re-rank the index's candidates exactly "
+                             "(auto = float32 unless the index is already exact Flat)")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="don't store the render-ready snapshot of result fields (results then come from MongoDB)")
+    parser.add_argument("--pca-dim", type=int, default=None,
+                        help="project embeddings to this many dimensions with a trained PCA before indexing "
+                             "(e.g. 128); the transform is saved with the index so queries go through it too")
+    parser.add_argument("--report", action="store_true",
+                        help="compare the built index with an exact float32 index on memory and recall@k")
+    parser.add_argument("--report-dims", default=None,
+                        help="with --report, also compare PCA-reduced builds at these dimensions, e.g. 64,128,256")
+    parser.add_argument("--embedder", default=config.EMBEDDER, choices=sorted(EMBEDDERS),
+                        help="embedding backend; the index records it so search uses the same one")
+    args = parser.parse_args()
+
+    # Create the embedder (Gemini reads the API key from config instead of hardcoding it)
+    embedder = get_embedder(args.embedder, api_key=config.GEMINI_API_KEY)
+    if args.pca_dim and args.pca_dim >= embedder.dim:
+        parser.error(f"--pca-dim must be below the embedding size ({embedder.dim})")
+    # Distances in the reduced space are not the cosine distances similarity
+    # thresholds are defined on; re-ranking against the full vectors restores them
+    if args.pca_dim and args.rerank_vectors == "none":
+        parser.error("--pca-dim needs re-rank vectors (--rerank-vectors auto, float32 or float16)")
+
+    # Connect to MongoDB
+    client = MongoClient("mongodb://localhost:27017/")
+    db = client["hostelDB"]
+    hostel_collection = db["hostels"]
+
+    # Resume from the write-ahead log of an interrupted build, if there is one
+    checkpoint = BuildCheckpoint(args.checkpoint_dir, embedder.describe())
+    if checkpoint.count:
+        print(f"↩️ Resuming build after {checkpoint.count} hostels (last _id {checkpoint.last_id})")
+
+    cache = None if args.no_cache else EmbeddingCache(args.cache)
+    batch_options = {"batch_size": args.batch_size, "workers": args.workers,
+                     "requests_per_minute": args.rpm, "max_retries": args.max_retries,
+                     "limiter": quota_limiter(args.rpm)}
+    start = time.perf_counter()
+    embedded = failed = 0
+
+    # Stream hostels chunk by chunk so memory stays bounded by --chunk-size
+    for hostels in iter_hostel_chunks(hostel_collection, args.chunk_size, after_id=checkpoint.last_id):
+        texts = [format_hostel(hostel) for hostel in hostels]
+        if cache is None:
+            vectors, errors, stats = embed_in_batches(texts, embedder, **batch_options)
+        else:
+            vectors, errors, stats = embed_with_cache(texts, cache, embedder, **batch_options)
+
+        for position, e in errors.items():
+            print(f"⚠️ Failed to generate embedding for {hostels[position]['name']}: {e}")
+        if errors and not args.allow_partial:
+            print(f"❌ {len(errors)} hostels could not be embedded, index not written. "
+                  "Fix the errors and rerun to resume, or rerun with --allow-partial.")
+            sys.exit(1)
+
+        # Store MongoDB IDs alongside embeddings
+        chunk_ids = [hostel["_id"] for hostel, vector in zip(hostels, vectors) if vector is not None]
+        chunk_vectors = [vector for vector in vectors if vector is not None]
+        failed += len(errors)
+        if not chunk_vectors:
+            continue
+
+        checkpoint.append(chunk_ids, np.array(chunk_vectors, dtype="float32"))
+        embedded += len(chunk_ids)
+        print(f"📦 {checkpoint.count} hostels embedded")
+
+    if cache is not None:
+        print(f"🗄️ Embedding cache: {cache.hits} hits, {cache.misses} misses "
+              f"({cache.hit_rate():.1%} hit rate)")
+        cache.close()
+
+    # Debugging: Check if data exists
+    if checkpoint.count == 0:
+        print("❌ No hostel data found in the database (or no embeddings generated). Did you run db.py?")
+        exit()
+
+    elapsed = time.perf_counter() - start
+    docs_per_sec = round(embedded / elapsed, 2) if elapsed > 0 else float(embedded)
+
+    # Create FAISS index from the logged vectors (trained on a sample first for PCA/IVF/PQ)
+    factory = index_builder.resolve_factory(args.index, embedder.dim, checkpoint.count, args.pca_dim)
+    index, factory = index_builder.build_index(checkpoint.vectors(), factory,
+                                               train_size=args.train_size, chunk_size=args.chunk_size)
+    search_params = index_builder.default_search_params(factory, nprobe=args.nprobe, ef_search=args.ef_search)
+
+    if args.report:
+        index_builder.apply_search_params(index, search_params)
+        indexes = {factory: index}
+        if args.report_dims:
+            dims = [int(dim) for dim in args.report_dims.split(",") if dim.strip()]
+            indexes.update(index_report.build_reduced_indexes(checkpoint.vectors(), args.index, dims,
+                                                              train_size=args.train_size, chunk_size=args.chunk_size,
+                                                              nprobe=args.nprobe, ef_search=args.ef_search,
+                                                              built=indexes))
+        index_report.print_report(index_report.compare_indexes(checkpoint.vectors(), indexes))
+
+    id_map = checkpoint.id_map()
+    shards = None
+    if args.shard_by_location:
+        cities = sharding.read_cities(hostel_collection, id_map, chunk_size=args.chunk_size)
+        shards = sharding.build_shards(checkpoint.vectors(), cities, args.index, args.min_shard_size,
+                                       train_size=args.train_size, chunk_size=args.chunk_size,
+                                       nprobe=args.nprobe, ef_search=args.ef_search, reduce_dim=args.pca_dim)
+
+    # Save FAISS index, hostel_ids, which embedder built them, the query-time knobs,
+    # the structured attributes used by filtered search, the keyword index, the shards,
+    # the re-rank vectors and the result snapshot
+    meta = dict(embedder.describe(), factory=factory, search_params=search_params)
+    store = attributes.build_attributes(hostel_collection, id_map, chunk_size=args.chunk_size)
+    lexical = lexical_index.build_lexical_index(hostel_collection, id_map, chunk_size=args.chunk_size)
+    rerank_dtype = args.rerank_vectors
+    if rerank_dtype == "auto":
+        rerank_dtype = "none" if factory == "Flat" else "float32"
+    vectors = None if rerank_dtype == "none" else VectorStore(checkpoint.vectors(), dtype=rerank_dtype)
+    # Result cards render from this snapshot instead of MongoDB (staged with the build log)
+    hostel_snapshot = None
+    if not args.no_snapshot:
+        hostel_snapshot = snapshot.build_snapshot(hostel_collection, id_map,
+                                                  os.path.join(args.checkpoint_dir, "snapshot.bin"),
+                                                  chunk_size=args.chunk_size)
+    version = index_store.publish_bundle(index, id_map, meta, attributes=store, lexical=lexical, shards=shards,
+                                         vectors=vectors, snapshot=hostel_snapshot)
+    checkpoint.clear()
+
+    print(f"✅ Published index version {version} with embeddings for {index.ntotal} hostels "
+          f"({docs_per_sec} docs/sec, {failed} failed).")
+
+if __name__ == "__main__":
+    main()
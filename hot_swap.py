@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+import index_store
+
+DEFAULT_WATCH_SECONDS = 30.0
+WARM_UP_QUERIES = 8
+
+# Function to run a few throwaway searches on a freshly loaded bundle, so page
+# faults and lazy allocations happen before it takes live traffic
+def warm_up(bundle, n_queries=WARM_UP_QUERIES):
+    queries = np.random.default_rng(0).standard_normal((n_queries, bundle.index.d)).astype("float32")
+    if bundle.index.ntotal:
+        bundle.index.search(queries, 10)
+    if bundle.shards is not None:
+        bundle.shards.search(queries, 10)
+    if bundle.lexical is not None:
+        bundle.lexical.search("hostel", 10)
+
+# Serves the current published index bundle and swaps in new versions while
+# queries keep running. A background thread watches the CURRENT pointer; a new
+# version is loaded and warmed up next to the live one, then a single reference
+# assignment makes it live. Queries take `current()` once and use that bundle
+# to the end, so in-flight searches finish on the old version, which is freed
+# (drained) when the last of them drops its reference.
+class LiveIndex:
+    def __init__(self, mmap=True, root=index_store.VERSIONS_DIR, interval=DEFAULT_WATCH_SECONDS):
+        self.mmap = mmap
+        self.root = root
+        self.interval = interval
+        self.swaps = 0
+        self._bundle = index_store.load_current_bundle(mmap=mmap, root=root)
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if interval:
+            self._thread = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+            self._thread.start()
+
+    # Function to get the bundle to use for one query (or one page render)
+    def current(self):
+        return self._bundle
+
+    # Function to load and swap in the published version if it changed; returns True on a swap
+    def refresh(self):
+        with self._refresh_lock:
+            version = index_store.current_version(self.root)
+            if version is None or version == self._bundle.version:
+                return False
+            bundle = index_store.load_bundle(*index_store.bundle_paths(version, self.root), mmap=self.mmap)
+            warm_up(bundle)
+            previous, self._bundle = self._bundle, bundle
+            self.swaps += 1
+            print(f"🔄 Swapped search index {previous.version} -> {bundle.version}")
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # A broken or half-deleted version must not take the live index down
+                print(f"⚠️ Could not load the new index version, still serving {self._bundle.version}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,80 @@
+from pymongo.errors import PyMongoError
+
+# Hostel fields the result cards render; hydrating only these keeps the
+# per-search payload small
+CARD_FIELDS = ("name", "location", "description", "monthly_rent", "ratings", "facilities", "room_types",
+               "gender", "distance_from_college", "contact", "added_date")
+
+# Function to fetch many hostels with one $in query; returns {ObjectId: document}.
+# With a DocumentCache, cached hostels are served from memory and only the rest
+# are queried (and then cached, unless they were edited while being fetched).
+def fetch_hostels(collection, hostel_ids, projection=None, cache=None):
+    unique_ids = list({hostel_id for hostel_id in hostel_ids if hostel_id})
+    if not unique_ids:
+        return {}
+    found, generation = {}, None
+    if cache is not None:
+        cache.check_updates(collection)
+        found = cache.get_many(unique_ids, projection)
+        unique_ids = [hostel_id for hostel_id in unique_ids if hostel_id not in found]
+        generation = cache.generation
+    if unique_ids:
+        fetched = list(collection.find({"_id": {"$in": unique_ids}}, projection=projection))
+        if cache is not None:
+            cache.put_many(fetched, projection, generation)
+        found.update((hostel["_id"], hostel) for hostel in fetched)
+    return found
+
+# Function to load the hostels of ranked search hits with a single $in query
+# (MongoDB returns them in no particular order, so rank order is restored here).
+# `hostel_ids` is best first; empty slots (None) are skipped. Returns (hostels,
+# missing): the found documents best first, and the IDs the index still points
+# at but the collection no longer has.
+def hydrate_hits(collection, hostel_ids, fields=CARD_FIELDS, cache=None):
+    hostel_ids = [hostel_id for hostel_id in hostel_ids if hostel_id]
+    projection = {field: 1 for field in fields} if fields else None
+    found = fetch_hostels(collection, hostel_ids, projection, cache)
+    hostels = [found[hostel_id] for hostel_id in hostel_ids if hostel_id in found]
+    missing = [hostel_id for hostel_id in hostel_ids if hostel_id not in found]
+    if missing:
+        print(f"⚠️ {len(missing)} indexed hostels are missing from MongoDB: {', '.join(map(str, missing))}")
+    return hostels, missing
+
+# Function to load the hostels of ranked hits by label. Bundles with a snapshot
+# render straight from it: MongoDB is only asked for fields the snapshot does
+# not hold and for hits it has no record of, and if MongoDB can't be reached
+# the snapshot records are served as they are. Returns (hostels, missing) like
+# hydrate_hits.
+def hydrate_labels(bundle, collection, labels, fields=CARD_FIELDS, cache=None):
+    labels = [label for label in labels if label != -1]
+    hostel_ids = bundle.hostel_ids.object_ids(labels)
+    if bundle.snapshot is None:
+        return hydrate_hits(collection, hostel_ids, fields, cache)
+
+    records = dict(zip(hostel_ids, bundle.snapshot.get_many(labels)))
+    records.pop(None, None)
+    extra_fields = [field for field in fields if field not in bundle.snapshot.fields]
+    unknown = [hostel_id for hostel_id, record in records.items() if record is None]
+    extras, fetched = {}, {}
+    try:
+        if extra_fields and collection is not None:
+            extras = fetch_hostels(collection, [hostel_id for hostel_id in records if hostel_id not in unknown],
+                                   {field: 1 for field in extra_fields}, cache)
+        if unknown and collection is not None:
+            fetched = {hostel["_id"]: hostel for hostel in hydrate_hits(collection, unknown, fields, cache)[0]}
+    except PyMongoError as e:
+        print(f"⚠️ MongoDB unavailable, rendering results from the index snapshot: {e}")
+
+    hostels, missing = [], []
+    for hostel_id in hostel_ids:
+        if hostel_id is None:
+            continue
+        if records[hostel_id] is not None:
+            hostel = dict(records[hostel_id], _id=hostel_id)
+            hostel.update(extras.get(hostel_id, {}))
+            hostels.append(hostel)
+        elif hostel_id in fetched:
+            hostels.append(fetched[hostel_id])
+        else:
+            missing.append(hostel_id)
+    return hostels, missing
@@ -0,0 +1,81 @@
+import numpy as np
+from bson import ObjectId
+
+_EMPTY = b"\x00" * 12
+
+# Maps FAISS int64 labels to hostel ObjectIds and back. Row `label` of an
+# (n, 12) uint8 array holds the 12 raw ObjectId bytes (12 bytes per hostel instead
+# of 96 for a unicode hex string); an all-zero row is the slot of a deleted hostel.
+class HostelIdMap:
+    def __init__(self, raw):
+        self.raw = np.asarray(raw, dtype=np.uint8).reshape(-1, 12)
+        self._sorted_keys = None
+        self._order = None
+
+    # Function to build a map from ObjectIds or hex strings (None/"" = empty slot)
+    @classmethod
+    def from_ids(cls, hostel_ids):
+        raw = b"".join(ObjectId(h).binary if h else _EMPTY for h in hostel_ids)
+        return cls(np.frombuffer(raw, dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes
+
+    # Function to get the ObjectId of one label (None for -1, out of range or deleted)
+    def __getitem__(self, label):
+        if not 0 <= label < len(self.raw):
+            return None
+        binary = self.raw[label].tobytes()
+        return ObjectId(binary) if binary != _EMPTY else None
+
+    # Function to map an array of labels to ObjectIds in one vectorized gather
+    def object_ids(self, labels):
+        labels = np.asarray(labels, dtype=np.int64)
+        valid = (labels >= 0) & (labels < len(self.raw))
+        rows = self.raw[np.where(valid, labels, 0)]
+        return [ObjectId(row.tobytes()) if ok and row.any() else None for row, ok in zip(rows, valid)]
+
+    # Function to map ObjectIds (or hex strings) back to labels; -1 where unknown
+    def labels_for(self, hostel_ids):
+        if self._sorted_keys is None:
+            # Fixed-width 12-byte keys sort byte-wise, so a sorted copy plus
+            # searchsorted gives a vectorized reverse lookup
+            keys = self.raw.view("S12").ravel()
+            self._order = np.argsort(keys, kind="stable")
+            self._sorted_keys = keys[self._order]
+        queries = np.array([ObjectId(h).binary for h in hostel_ids], dtype="S12")
+        if len(self._sorted_keys) == 0 or len(queries) == 0:
+            return np.full(len(queries), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_keys, queries), len(self._sorted_keys) - 1)
+        found = self._sorted_keys[positions] == queries
+        return np.where(found, self._order[positions], -1).astype(np.int64)
+
+    # Function to add hostels at the end; returns their new labels
+    def append(self, hostel_ids):
+        added = HostelIdMap.from_ids(hostel_ids).raw
+        start = len(self.raw)
+        self.raw = np.concatenate([self.raw, added])
+        self._sorted_keys = None
+        return np.arange(start, start + len(added), dtype=np.int64)
+
+    # Function to empty the slots of deleted hostels (labels are never reused)
+    def clear(self, labels):
+        self.raw = np.array(self.raw)
+        self.raw[np.asarray(labels, dtype=np.int64)] = 0
+        self._sorted_keys = None
+
+    # Function to list the labels that still hold a hostel
+    def live_labels(self):
+        return np.flatnonzero(self.raw.any(axis=1))
+
+# Function to load an ID sidecar. Older builds saved a unicode array of hex
+# strings; those are converted to the compact form in memory.
+def load_id_map(path, mmap=False):
+    raw = np.load(path, mmap_mode="r" if mmap else None)
+    if raw.dtype.kind == "U":
+        return HostelIdMap.from_ids([str(h) for h in raw])
+    return HostelIdMap(raw)
@@ -0,0 +1,138 @@
+import math
+import re
+import faiss
+import numpy as np
+
+# Named index layouts; {nlist} and {m} are filled in from the catalog size and
+# dimension. Anything else passed to --index is used as a FAISS factory string.
+INDEX_PRESETS = {
+    "flat": "Flat",
+    "ivf": "IVF{nlist},Flat",
+    "hnsw": "HNSW32",
+    # Scalar-quantized storage: 1 byte (SQ8) or 2 bytes (fp16) per dimension instead of 4
+    "sq8": "SQ8",
+    "sqfp16": "SQfp16",
+    "ivfsq8": "IVF{nlist},SQ8",
+    "ivfpq": "IVF{nlist},PQ{m}",
+    "opq": "OPQ{m},IVF{nlist},PQ{m}",
+}
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+# Function to pick the number of IVF lists: ~4*sqrt(n), with at least 39 training points per list
+def default_nlist(count):
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+# Function to pick the number of PQ sub-quantizers: the largest of 64/48/32/16/8 that divides dim
+def default_pq_m(dim):
+    for m in (64, 48, 32, 16, 8):
+        if dim % m == 0:
+            return m
+    return 1
+
+# Function to turn a preset name or factory string into a factory string. With
+# reduce_dim, a trained PCA stage first projects the vectors to that many
+# dimensions; the index stores reduce_dim-d vectors but still takes full-size
+# queries, since the transform is saved with it.
+def resolve_factory(spec, dim, count, reduce_dim=None):
+    if reduce_dim and reduce_dim >= dim:
+        raise ValueError(f"Cannot reduce {dim}-d embeddings to {reduce_dim} dimensions")
+    factory = INDEX_PRESETS.get(spec.lower(), spec)
+    factory = factory.format(nlist=default_nlist(count), m=default_pq_m(reduce_dim or dim))
+    return f"PCA{reduce_dim},{factory}" if reduce_dim else factory
+
+# Function to read the output dimension of a PCA stage out of a factory string (0 if none)
+def pca_dim(factory):
+    match = re.match(r"PCAR?W?(\d+),", factory)
+    return int(match.group(1)) if match else 0
+
+# Function to read the number of IVF lists out of a factory string (0 if not IVF)
+def ivf_nlist(factory):
+    match = re.search(r"IVF(\d+)", factory)
+    return int(match.group(1)) if match else 0
+
+# Function to get the smallest catalog a factory string can be trained on
+def min_training_points(factory):
+    needed = max(1, ivf_nlist(factory), pca_dim(factory))
+    if any(part.startswith(("PQ", "OPQ")) for part in factory.split(",")):
+        needed = max(needed, 256)  # 8-bit PQ trains 256 centroids per sub-quantizer
+    return needed
+
+# Function to choose which stored vectors are used for training: a uniform random
+# sample (sorted, so reads from the memory-mapped log stay sequential)
+def select_training_sample(vectors, factory, train_size=None, seed=1234):
+    count = len(vectors)
+    if train_size is None:
+        train_size = max(50 * ivf_nlist(factory), 39 * 256)
+    if train_size >= count:
+        return np.array(vectors[:], dtype="float32")
+    rows = np.sort(np.random.default_rng(seed).choice(count, size=train_size, replace=False))
+    return np.array(vectors[rows], dtype="float32")
+
+# Function to get the query-time knobs that apply to a factory string
+def default_search_params(factory, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    params = {}
+    if "IVF" in factory:
+        params["nprobe"] = nprobe
+    if "HNSW" in factory:
+        params["efSearch"] = ef_search
+    return params
+
+# Function to build an index that carries labels from a (possibly memory-mapped)
+# array of vectors, training on a sample first and adding in chunks. Labels are
+# row numbers unless `labels` (one per row) is given. IVF indexes store labels in
+# their inverted lists (and can remove them), so only the other layouts are
+# wrapped in IDMap2.
+def build_index(vectors, factory, train_size=None, chunk_size=10000, labels=None):
+    count, dim = vectors.shape
+    if count < min_training_points(factory):
+        print(f"⚠️ {count} hostels are too few to train {factory}, building Flat instead")
+        factory = "Flat"
+    index = faiss.index_factory(dim, factory if ivf_nlist(factory) else f"IDMap2,{factory}")
+    if not index.is_trained:
+        sample = select_training_sample(vectors, factory, train_size)
+        print(f"🎯 Training {factory} on {len(sample)} of {count} vectors")
+        index.train(sample)
+    for offset in range(0, count, chunk_size):
+        chunk = np.ascontiguousarray(vectors[offset:offset + chunk_size], dtype="float32")
+        ids = np.arange(offset, offset + len(chunk)) if labels is None else labels[offset:offset + len(chunk)]
+        index.add_with_ids(chunk, np.asarray(ids, dtype="int64"))
+    return index, factory
+
+# Function to get the labels an index holds: the IDMap table, or the ids stored
+# in the inverted lists of a native IVF index
+def index_labels(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return np.arange(index.ntotal, dtype="int64")
+    invlists = ivf.invlists
+    labels = []
+    for list_no in range(ivf.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            ids = invlists.get_ids(list_no)
+            labels.append(faiss.rev_swig_ptr(ids, size).copy())
+            invlists.release_ids(list_no, ids)
+    return np.concatenate(labels) if labels else np.zeros(0, dtype="int64")
+
+# Function to tell whether vectors can be removed from (or replaced in) an index
+# without damaging it. HNSW graphs can't drop nodes. Native IVF indexes remove
+# their own labels, but an IVF index under an IDMap2 wrapper (older builds) keeps
+# its internal ids while the wrapper compacts its label table, so remove_ids
+# would silently mislabel the remaining vectors.
+def supports_removal(index):
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2)) and faiss.try_extract_index_ivf(inner) is not None:
+        return False
+    while isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexPreTransform)):
+        inner = faiss.downcast_index(inner.index)
+    return not isinstance(inner, faiss.IndexHNSW)
+
+# Function to apply saved query-time knobs (nprobe, efSearch) to a loaded index
+def apply_search_params(index, params):
+    space = faiss.ParameterSpace()
+    for name, value in (params or {}).items():
+        space.set_index_parameter(index, name, value)
@@ -0,0 +1,93 @@
+import time
+import faiss
+import numpy as np
+import index_builder
+
+DEFAULT_KS = (1, 5, 10)
+DEFAULT_QUERIES = 1000
+# Dimensions compared by the dimension-reduction report
+DEFAULT_REPORT_DIMS = (64, 128, 256)
+
+# Function to measure how much memory an index needs (its serialized size)
+def index_memory_bytes(index):
+    return int(faiss.serialize_index(index).nbytes)
+
+# Function to pick query vectors for the report: a random sample of the catalog itself
+def sample_queries(vectors, n_queries=DEFAULT_QUERIES, seed=4321):
+    count = len(vectors)
+    rows = np.sort(np.random.default_rng(seed).choice(count, size=min(n_queries, count), replace=False))
+    return np.array(vectors[rows], dtype="float32")
+
+# Function to get exact top-k labels with a float32 flat scan (labels = row numbers)
+def exact_neighbors(vectors, queries, k, chunk_size=10000):
+    baseline = faiss.IndexFlatL2(vectors.shape[1])
+    for offset in range(0, len(vectors), chunk_size):
+        baseline.add(np.ascontiguousarray(vectors[offset:offset + chunk_size], dtype="float32"))
+    _, labels = baseline.search(queries, k)
+    return baseline, labels
+
+# Function to compute recall@k: the share of the exact top-k that an index also returns in its top-k
+def recall_at_k(labels, truth, k):
+    k = min(k, truth.shape[1])
+    hits = sum(len(np.intersect1d(found[:k], expected[:k])) for found, expected in zip(labels, truth))
+    return hits / (len(truth) * k)
+
+# Function to compare indexes against the exact float32 baseline on memory,
+# recall@k and query latency. `indexes` maps a display name to a built index.
+def compare_indexes(vectors, indexes, ks=DEFAULT_KS, n_queries=DEFAULT_QUERIES):
+    queries = sample_queries(vectors, n_queries)
+    k_max = min(max(ks), len(vectors))
+    baseline, truth = exact_neighbors(vectors, queries, k_max)
+
+    rows, sizes = [], []
+    for name, index in [("Flat float32 (baseline)", baseline)] + list(indexes.items()):
+        start = time.perf_counter()
+        _, labels = index.search(queries, k_max)
+        elapsed = time.perf_counter() - start
+        size = index_memory_bytes(index)
+        sizes.append(size)
+        row = {
+            "index": name,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "bytes_per_vector": round(size / max(1, index.ntotal), 1),
+            "ms_per_query": round(1000 * elapsed / len(queries), 3),
+        }
+        for k in ks:
+            row[f"recall@{k}"] = round(recall_at_k(labels, truth, k), 4)
+        rows.append(row)
+
+    # Ratios come from the raw byte counts: small indexes round to 0.0 MB
+    for row, size in zip(rows, sizes):
+        row["memory_vs_float32"] = f"{size / max(1, sizes[0]):.2f}x"
+    return rows
+
+# Function to build the index `spec` again at each reduced dimension (a PCA stage
+# in front), for comparing recall against the full-dimension baseline. Queries
+# stay full-dimension: each index applies its own trained transform. Factories
+# already in `built` (e.g. the index being published) are not built again.
+def build_reduced_indexes(vectors, spec, dims=DEFAULT_REPORT_DIMS, train_size=None, chunk_size=10000,
+                          nprobe=index_builder.DEFAULT_NPROBE, ef_search=index_builder.DEFAULT_EF_SEARCH,
+                          built=None):
+    indexes = {}
+    built = built or {}
+    for dim in dims:
+        if dim >= vectors.shape[1]:
+            continue
+        factory = index_builder.resolve_factory(spec, vectors.shape[1], len(vectors), reduce_dim=dim)
+        if factory in built or factory in indexes:
+            continue
+        index, factory = index_builder.build_index(vectors, factory, train_size, chunk_size)
+        # Too few vectors to train falls back to Flat, which may be compared already
+        if factory in built or factory in indexes:
+            continue
+        index_builder.apply_search_params(index, index_builder.default_search_params(factory, nprobe, ef_search))
+        indexes[factory] = index
+    return indexes
+
+# Function to print report rows as an aligned table
+def print_report(rows):
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
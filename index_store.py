@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+import time
+import faiss
+import numpy as np
+import index_builder
+from attributes import AttributeStore
+from lexical_index import LexicalIndex
+from sharding import ShardedIndex
+from vector_store import VectorStore
+from snapshot import HostelSnapshot
+from id_map import HostelIdMap, load_id_map
+
+INDEX_PATH = "hostel_index.faiss"
+IDS_PATH = "hostel_ids.npy"
+
+# Published builds live in VERSIONS_DIR/<version>/ and VERSIONS_DIR/CURRENT names
+# the live one. Without a CURRENT file, INDEX_PATH/IDS_PATH are read as before.
+VERSIONS_DIR = "hostel_index.versions"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 3
+# Versions younger than this are never pruned: a process may still be loading one
+KEEP_SECONDS = 600
+
+# Indexes built before metadata was recorded were all Gemini embedding-001
+LEGACY_META = {"embedder": "gemini", "model": "models/embedding-001"}
+
+# Function to get the metadata file that sits next to an index file
+def meta_path(index_path):
+    return os.path.splitext(index_path)[0] + ".meta.json"
+
+# Function to get the structured-attribute file that sits next to an index file
+def attributes_path(index_path):
+    return os.path.splitext(index_path)[0] + ".attrs.npz"
+
+# Function to get the keyword (BM25) index file that sits next to an index file
+def lexical_path(index_path):
+    return os.path.splitext(index_path)[0] + ".lexical.npz"
+
+# Function to get the full-precision vector file (for exact re-ranking) that sits next to an index file
+def vectors_path(index_path):
+    return os.path.splitext(index_path)[0] + ".vectors.npy"
+
+# Function to get the render-ready snapshot of the result card fields that sits next to an index file
+def snapshot_path(index_path):
+    return os.path.splitext(index_path)[0] + ".snapshot.bin"
+
+# Function to get the directory of per-city shards that sits next to an index file
+def shards_path(index_path):
+    return os.path.splitext(index_path)[0] + ".shards"
+
+# Everything the search path needs from one index build
+class IndexBundle:
+    def __init__(self, index, hostel_ids, meta, attributes=None, lexical=None, shards=None, vectors=None,
+                 snapshot=None):
+        self.index = index
+        self.hostel_ids = hostel_ids
+        self.meta = meta
+        self.attributes = attributes
+        self.lexical = lexical
+        self.shards = shards
+        self.vectors = vectors
+        self.snapshot = snapshot
+
+    # Version of the published build ("legacy" for unversioned files)
+    @property
+    def version(self):
+        return self.meta.get("version", "legacy")
+
+# Function to read the metadata of an index (falls back to LEGACY_META)
+def read_meta(index_path, index=None):
+    path = meta_path(index_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    meta = dict(LEGACY_META)
+    if index is not None:
+        meta["dim"] = index.d
+    return meta
+
+# Function to save an index, its hostel IDs (a HostelIdMap, or ObjectIds/hex strings) and its metadata
+def save_bundle(index, hostel_ids, meta, index_path=INDEX_PATH, ids_path=IDS_PATH, attributes=None,
+                lexical=None, shards=None, vectors=None, snapshot=None):
+    meta = dict(meta, dim=index.d, ntotal=index.ntotal)
+    meta.pop("snapshot_fields", None)
+    if not isinstance(hostel_ids, HostelIdMap):
+        hostel_ids = HostelIdMap.from_ids(hostel_ids)
+    faiss.write_index(index, index_path)
+    np.save(ids_path, hostel_ids.raw)
+    if attributes is not None:
+        attributes.save(attributes_path(index_path))
+    if lexical is not None:
+        lexical.save(lexical_path(index_path))
+    if vectors is not None:
+        vectors.save(vectors_path(index_path))
+    elif os.path.exists(vectors_path(index_path)):
+        # Vectors from an earlier build would re-rank with the wrong rows
+        os.remove(vectors_path(index_path))
+    if snapshot is not None:
+        snapshot.save(snapshot_path(index_path))
+        meta["snapshot_fields"] = list(snapshot.fields)
+    # Shards from an earlier build would point at labels of the old index
+    shutil.rmtree(shards_path(index_path), ignore_errors=True)
+    if shards is not None:
+        shards.save(shards_path(index_path))
+    with open(meta_path(index_path), "w") as f:
+        json.dump(meta, f, indent=2)
+
+# Function to flush a file (or a directory entry) to disk
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Function to get the version the CURRENT pointer names (None if nothing is published)
+def current_version(root=VERSIONS_DIR):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Function to get the index and ID paths of a published version (default: the
+# current one), or the unversioned INDEX_PATH/IDS_PATH when nothing is published
+def bundle_paths(version=None, root=VERSIONS_DIR):
+    version = version or current_version(root)
+    if version is None:
+        return INDEX_PATH, IDS_PATH
+    return os.path.join(root, version, INDEX_PATH), os.path.join(root, version, IDS_PATH)
+
+# Function to publish a bundle as a new version without ever exposing a partial
+# one: every file is written and fsynced in a staging directory, the directory is
+# renamed into place, and only then is CURRENT atomically replaced to point at
+# it. Readers see either the old version or the new one, never a mix.
+def publish_bundle(index, hostel_ids, meta, attributes=None, lexical=None, shards=None, vectors=None,
+                   snapshot=None, root=VERSIONS_DIR, keep=KEEP_VERSIONS, keep_seconds=KEEP_SECONDS):
+    # Sortable by publish time, down to the nanosecond
+    now = time.time_ns()
+    version = time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 10**9)) + f"-{now % 10**9:09d}"
+    staging = os.path.join(root, f".staging-{version}")
+    os.makedirs(staging)
+    save_bundle(index, hostel_ids, dict(meta, version=version),
+                os.path.join(staging, INDEX_PATH), os.path.join(staging, IDS_PATH),
+                attributes=attributes, lexical=lexical, shards=shards, vectors=vectors, snapshot=snapshot)
+    for directory, _, files in os.walk(staging):
+        for name in files:
+            _fsync(os.path.join(directory, name))
+    os.rename(staging, os.path.join(root, version))
+
+    pointer = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(pointer, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+    _fsync(root)
+    prune_versions(root, keep, keep_seconds)
+    return version
+
+# Function to delete all but the newest `keep` versions, sparing the current one
+# and any published less than `keep_seconds` ago (a hot swap may be loading it
+# right now, however many versions came after). Processes still serving a
+# deleted version keep their open/mapped files.
+def prune_versions(root=VERSIONS_DIR, keep=KEEP_VERSIONS, keep_seconds=KEEP_SECONDS):
+    current = current_version(root)
+    versions = sorted(name for name in os.listdir(root)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(root, name)))
+    cutoff = time.time() - keep_seconds
+    for name in versions[:-keep] if keep else versions:
+        path = os.path.join(root, name)
+        if name != current and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+# Function to load the current published bundle (or the unversioned files)
+def load_current_bundle(mmap=False, root=VERSIONS_DIR):
+    return load_bundle(*bundle_paths(root=root), mmap=mmap)
+
+# Function to get the FAISS flags for a read-only, memory-mapped load. Flat
+# vectors are mapped with IO_FLAG_MMAP_IFC (newer FAISS releases only, older ones
+# read flat codes into memory as before); IVF lists need IO_FLAG_MMAP alone, since
+# those releases raise a RuntimeError when both flags are set (see read_index_mmap).
+def mmap_io_flags(ivf=False):
+    ifc = 0 if ivf else getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    return faiss.IO_FLAG_MMAP | ifc | faiss.IO_FLAG_READ_ONLY
+
+# Function to read an index memory-mapped. Whether the file holds IVF lists is
+# only known once it is read, so the flat flags are tried first and IVF indexes
+# are read again with IO_FLAG_MMAP alone.
+def read_index_mmap(path):
+    try:
+        return faiss.read_index(path, mmap_io_flags())
+    except RuntimeError:
+        if mmap_io_flags() == mmap_io_flags(ivf=True):
+            raise
+        return faiss.read_index(path, mmap_io_flags(ivf=True))
+
+# Function to load an index, its hostel IDs and its metadata. With mmap=True the
+# index data and the ID array are memory-mapped instead of copied into the heap,
+# so startup only touches the pages it needs and workers on one host share them
+# through the page cache. A memory-mapped bundle is read-only.
+def load_bundle(index_path=INDEX_PATH, ids_path=IDS_PATH, mmap=False):
+    index = read_index_mmap(index_path) if mmap else faiss.read_index(index_path)
+    hostel_ids = load_id_map(ids_path, mmap=mmap)
+    meta = read_meta(index_path, index)
+    if meta.get("dim", index.d) != index.d:
+        raise ValueError(f"Index metadata says dim={meta['dim']} but {index_path} has dim={index.d}")
+    if is_id_mapped(index):
+        # Labels index into hostel_ids; deleted hostels leave an empty slot behind
+        labels = index_builder.index_labels(index)
+        if len(labels) and labels.max() >= len(hostel_ids):
+            raise ValueError(f"{index_path} has label {labels.max()} but {ids_path} only has {len(hostel_ids)} IDs")
+    elif len(hostel_ids) != index.ntotal:
+        raise ValueError(f"{ids_path} has {len(hostel_ids)} IDs but {index_path} has {index.ntotal} vectors")
+    # Query-time knobs saved by the build (nprobe for IVF, efSearch for HNSW)
+    index_builder.apply_search_params(index, meta.get("search_params"))
+    # Structured attributes for filtered search (older builds don't have them)
+    attributes = None
+    if os.path.exists(attributes_path(index_path)):
+        attributes = AttributeStore.load(attributes_path(index_path))
+    lexical = None
+    if os.path.exists(lexical_path(index_path)):
+        lexical = LexicalIndex.load(lexical_path(index_path))
+    shards = None
+    if os.path.exists(shards_path(index_path)):
+        shards = ShardedIndex.load(shards_path(index_path), read_index_mmap if mmap else faiss.read_index)
+    # Full-precision vectors are always memory-mapped; re-ranking reads only candidate rows
+    vectors = None
+    if os.path.exists(vectors_path(index_path)):
+        vectors = VectorStore.load(vectors_path(index_path))
+    # The snapshot only counts if the metadata says which fields it holds
+    snapshot = None
+    if "snapshot_fields" in meta and os.path.exists(snapshot_path(index_path)):
+        snapshot = HostelSnapshot.load(snapshot_path(index_path), meta["snapshot_fields"])
+    return IndexBundle(index, hostel_ids, meta, attributes, lexical, shards, vectors, snapshot)
+
+# Function to check whether an index carries its own int64 labels (an IDMap
+# wrapper, or the inverted lists of an IVF index)
+def is_id_mapped(index):
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or faiss.try_extract_index_ivf(index) is not None
+
+# Function to create an empty ID-mapped flat index. Labels are positions in
+# hostel_ids, so they stay stable while hostels are added and removed.
+def new_id_mapped_index(dim):
+    return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+# Function to convert an older positional index into an ID-mapped one (label = row)
+def to_id_mapped(index):
+    if is_id_mapped(index):
+        return index
+    id_mapped = new_id_mapped_index(index.d)
+    if index.ntotal:
+        id_mapped.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype="int64"))
+    return id_mapped
+
+# Function to reject an index that was built with a different embedder than the one querying it
+def check_embedder(meta, embedder):
+    expected = embedder.describe()
+    for field in ("embedder", "model", "dim"):
+        if meta.get(field) is not None and expected.get(field) is not None and meta[field] != expected[field]:
+            raise ValueError(
+                f"Index was built with {meta.get('embedder')} ({meta.get('model')}, dim={meta.get('dim')}) "
+                f"but search is configured for {expected['embedder']} ({expected['model']}, dim={expected['dim']})"
+            )
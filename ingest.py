@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+from itertools import islice
+import numpy as np
+from bson import ObjectId
+from id_map import HostelIdMap
+
+# Only the fields that go into the embedded text are pulled from MongoDB
+EMBED_FIELDS = {
+    "name": 1, "location": 1, "description": 1, "facilities": 1,
+    "room_types": 1, "monthly_rent": 1, "gender": 1,
+}
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHECKPOINT_DIR = ".index_build"
+
+# Function to stream hostels in _id order, chunk by chunk, with a projected cursor.
+# after_id resumes right after the last hostel of an interrupted build.
+def iter_hostel_chunks(collection, chunk_size=DEFAULT_CHUNK_SIZE, after_id=None, projection=EMBED_FIELDS):
+    query = {"_id": {"$gt": ObjectId(after_id)}} if after_id else {}
+    cursor = collection.find(query, projection=projection, sort=[("_id", 1)], batch_size=chunk_size)
+    while True:
+        chunk = list(islice(cursor, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+# Function to get the updated_at watermark of a collection: the newest updated_at
+# and the _ids edited at that instant, or (None, set()) if nothing has one
+def latest_watermark(collection):
+    latest = collection.find_one({"updated_at": {"$exists": True}}, projection={"updated_at": 1},
+                                 sort=[("updated_at", -1)])
+    if latest is None:
+        return None, set()
+    at_latest = collection.find({"updated_at": latest["updated_at"]}, projection={"_id": 1})
+    return latest["updated_at"], {hostel["_id"] for hostel in at_latest}
+
+# Function to get the hostels edited since a watermark, oldest first, and the new
+# watermark. Edits can share the watermark's timestamp, so the query uses $gte and
+# skips the _ids already seen at it. `projection` must include updated_at.
+def find_edited_since(collection, watermark, projection=None):
+    last_seen, seen_ids = watermark
+    query = {"updated_at": {"$gte": last_seen}} if last_seen is not None else {"updated_at": {"$exists": True}}
+    found = list(collection.find(query, projection=projection).sort("updated_at", 1))
+    if not found:
+        return [], watermark
+    edited = [hostel for hostel in found if hostel["updated_at"] != last_seen or hostel["_id"] not in seen_ids]
+    newest = found[-1]["updated_at"]
+    return edited, (newest, {hostel["_id"] for hostel in found if hostel["updated_at"] == newest})
+
+# Write-ahead log of an index build. Vectors and 12-byte ObjectIds are appended
+# to flat files and fsynced before state.json records the new count, so after a
+# crash the build resumes from the last complete chunk and any partly written
+# tail is truncated away.
+class BuildCheckpoint:
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.dim = meta["dim"]
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.ids_path = os.path.join(directory, "ids.bin")
+        self.state_path = os.path.join(directory, "state.json")
+        self.count = 0
+        self.last_id = None
+
+        state = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+        if state is not None and state.get("meta") == meta:
+            self.count = state["count"]
+            self.last_id = state["last_id"]
+        else:
+            # Nothing to resume (or it was built with another embedder): start over
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+        for path, record_size in ((self.vectors_path, self.dim * 4), (self.ids_path, 12)):
+            with open(path, "ab") as f:
+                f.truncate(self.count * record_size)
+
+    # Function to durably append one chunk of (ObjectId, vector) pairs
+    def append(self, ids, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        for path, payload in ((self.vectors_path, vectors.tobytes()),
+                              (self.ids_path, b"".join(ObjectId(i).binary for i in ids))):
+            with open(path, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        self.count += len(ids)
+        self.last_id = str(ids[-1])
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"meta": self.meta, "count": self.count, "last_id": self.last_id}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    # Function to memory-map the logged vectors without loading them all
+    def vectors(self):
+        return np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.count, self.dim))
+
+    # Function to get all logged hostel IDs (label = row in the log)
+    def id_map(self):
+        with open(self.ids_path, "rb") as f:
+            raw = f.read(self.count * 12)
+        return HostelIdMap(np.frombuffer(raw, dtype=np.uint8))
+
+    # Function to delete the log once the index has been saved
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,234 @@
+import math
+import re
+import numpy as np
+from ingest import iter_hostel_chunks, DEFAULT_CHUNK_SIZE
+
+# Fields that go into the keyword (BM25) index
+LEXICAL_FIELDS = {"name": 1, "location": 1, "description": 1, "facilities": 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Updates are held in a small delta and merged into the arrays once this many
+# documents (or this fraction of the catalog) have changed, or on save
+MERGE_MIN_DOCS = 1000
+MERGE_FRACTION = 0.01
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Function to split text into lower-cased alphanumeric tokens ("Wi-Fi" -> "wi", "fi")
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+# Function to get the keyword text of a hostel document
+def lexical_text(hostel):
+    facilities = hostel.get("facilities") or []
+    return " ".join([str(hostel.get("name", "")), str(hostel.get("location", "")),
+                     str(hostel.get("description", ""))] + [str(f) for f in facilities])
+
+# Function to count the tokens of one text
+def _term_counts(text):
+    counts = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+# Function to pick the smallest unsigned dtype that can hold `largest`
+def _compact_dtype(largest):
+    return np.min_scalar_type(max(int(largest), 0))
+
+# BM25 inverted index over index labels. Postings are array-backed: the labels
+# of term t are gaps[offsets[t]:offsets[t + 1]], delta-encoded (first label, then
+# differences) in the smallest unsigned dtype that fits, with term frequencies
+# alongside. A lookup decodes a term with one cumsum and scores it vectorized.
+# Updates mark the changed labels stale and keep their new postings in a
+# per-term delta until merge() re-encodes everything in one pass.
+class LexicalIndex:
+    def __init__(self, terms, offsets, gaps, tfs, doc_len):
+        self.terms = list(terms)
+        self.term_id = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.gaps = gaps
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.doc_count = int(np.count_nonzero(doc_len))
+        self.avg_len = float(doc_len.sum()) / max(1, self.doc_count)
+        self._stale = np.empty(0, dtype=np.int64)
+        self._delta = {}
+        self._delta_docs = {}
+
+    # Function to build an index from (term, label, tf) triplets and per-label lengths
+    @classmethod
+    def from_postings(cls, terms, term_ids, labels, tfs, doc_len):
+        order = np.lexsort((labels, term_ids))
+        term_ids, labels, tfs = term_ids[order], labels[order], tfs[order]
+        offsets = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+        starts = offsets[:-1][np.diff(offsets) > 0]
+        gaps = np.diff(labels, prepend=0)
+        gaps[starts] = labels[starts]
+        gaps = gaps.astype(_compact_dtype(gaps.max() if len(gaps) else 0))
+        tfs = tfs.astype(_compact_dtype(tfs.max() if len(tfs) else 0))
+        return cls(terms, offsets, gaps, tfs, doc_len)
+
+    # Function to tokenize documents into (term, label, tf) arrays plus per-document
+    # lengths, growing `terms`/`term_id` with any unseen tokens
+    @staticmethod
+    def _tokenize_docs(labels, texts, terms, term_id):
+        term_ids, doc_labels, tfs, lengths = [], [], [], []
+        for label, text in zip(labels, texts):
+            counts = _term_counts(text)
+            lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                if token not in term_id:
+                    term_id[token] = len(terms)
+                    terms.append(token)
+                term_ids.append(term_id[token])
+                doc_labels.append(label)
+                tfs.append(count)
+        return (np.array(term_ids, dtype=np.int32), np.array(doc_labels, dtype=np.int64),
+                np.array(tfs, dtype=np.int32), np.array(lengths, dtype=np.float32))
+
+    @classmethod
+    def from_texts(cls, labels, texts, rows):
+        terms, term_id = [], {}
+        term_ids, doc_labels, tfs, lengths = cls._tokenize_docs(labels, texts, terms, term_id)
+        doc_len = np.zeros(rows, dtype=np.float32)
+        doc_len[np.asarray(labels, dtype=np.int64)] = lengths
+        return cls.from_postings(terms, term_ids, doc_labels, tfs, doc_len)
+
+    # Function to decode every posting back to (term, label, tf) triplets
+    def _postings(self):
+        counts = np.diff(self.offsets)
+        term_ids = np.repeat(np.arange(len(self.terms), dtype=np.int64), counts)
+        # One cumsum over all terms; each term's first entry is an absolute label,
+        # so subtracting the running total before the term decodes it
+        totals = np.cumsum(self.gaps, dtype=np.int64)
+        before = np.concatenate([[0], totals])[self.offsets[:-1]]
+        return term_ids, totals - np.repeat(before, counts), self.tfs.astype(np.int64)
+
+    # Function to replace the postings of `labels` (upserts) or drop them (texts=None).
+    # Only the changed documents are tokenized; the arrays are re-encoded by
+    # merge() once the delta grows past MERGE_MIN_DOCS / MERGE_FRACTION.
+    def update(self, labels, texts=None):
+        labels = [int(label) for label in labels]
+        rows = max([len(self.doc_len)] + [label + 1 for label in labels])
+        if rows > len(self.doc_len):
+            self.doc_len = np.concatenate([self.doc_len, np.zeros(rows - len(self.doc_len), dtype=np.float32)])
+        for label in labels:
+            for term in self._delta_docs.pop(label, {}):
+                self._delta[term].pop(label, None)
+                if not self._delta[term]:
+                    del self._delta[term]
+        self._stale = np.union1d(self._stale, np.asarray(labels, dtype=np.int64))
+        self.doc_len[labels] = 0
+        if texts is not None:
+            for label, text in zip(labels, texts):
+                counts = _term_counts(text)
+                self._delta_docs[label] = counts
+                for term, count in counts.items():
+                    self._delta.setdefault(term, {})[label] = count
+                self.doc_len[label] = sum(counts.values())
+        self.doc_count = int(np.count_nonzero(self.doc_len))
+        self.avg_len = float(self.doc_len.sum()) / max(1, self.doc_count)
+        if len(self._stale) >= max(MERGE_MIN_DOCS, MERGE_FRACTION * self.doc_count):
+            self.merge()
+
+    # Function to fold the pending delta into the encoded arrays
+    def merge(self):
+        if not len(self._stale):
+            return
+        term_ids, doc_labels, tfs = self._postings()
+        keep = ~np.isin(doc_labels, self._stale)
+        terms, term_id = list(self.terms), dict(self.term_id)
+        new_terms, new_labels, new_tfs = [], [], []
+        for term, found in self._delta.items():
+            if term not in term_id:
+                term_id[term] = len(terms)
+                terms.append(term)
+            new_terms.extend([term_id[term]] * len(found))
+            new_labels.extend(found.keys())
+            new_tfs.extend(found.values())
+        merged = LexicalIndex.from_postings(
+            terms, np.concatenate([term_ids[keep], np.array(new_terms, dtype=np.int64)]),
+            np.concatenate([doc_labels[keep], np.array(new_labels, dtype=np.int64)]),
+            np.concatenate([tfs[keep], np.array(new_tfs, dtype=np.int64)]), self.doc_len)
+        self.__dict__.update(merged.__dict__)
+
+    # Function to get the labels and tfs of one term (labels ascending)
+    def postings(self, term):
+        t = self.term_id.get(term)
+        if t is None:
+            labels, tfs = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        else:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            labels, tfs = np.cumsum(self.gaps[start:end], dtype=np.int64), self.tfs[start:end]
+        if len(self._stale):
+            live = ~np.isin(labels, self._stale)
+            labels, tfs = labels[live], tfs[live]
+        found = self._delta.get(term)
+        if found:
+            labels = np.concatenate([labels, np.fromiter(found.keys(), dtype=np.int64, count=len(found))])
+            tfs = np.concatenate([tfs, np.fromiter(found.values(), dtype=np.int64, count=len(found))])
+            order = np.argsort(labels, kind="stable")
+            labels, tfs = labels[order], tfs[order]
+        return labels, tfs
+
+    # Function to get the BM25 top-k labels for a query, optionally restricted to
+    # a boolean row mask. Returns (scores, labels), best first.
+    def search(self, query, k=10, mask=None):
+        found_labels, found_scores = [], []
+        for term in set(tokenize(query)):
+            labels, tfs = self.postings(term)
+            df = len(labels)
+            if mask is not None:
+                allowed = labels < len(mask)
+                allowed[allowed] = mask[labels[allowed]]
+                labels, tfs = labels[allowed], tfs[allowed]
+            if not len(labels):
+                continue
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[labels] / self.avg_len)
+            found_labels.append(labels)
+            found_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+        if not found_labels:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        labels, inverse = np.unique(np.concatenate(found_labels), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(found_scores))
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scores[top].astype(np.float32), labels[top]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.gaps.nbytes + self.tfs.nbytes + self.doc_len.nbytes
+
+    def save(self, path):
+        self.merge()
+        with open(path, "wb") as f:
+            np.savez(f, terms=np.array(self.terms, dtype=str), offsets=self.offsets,
+                     gaps=self.gaps, tfs=self.tfs, doc_len=self.doc_len)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([str(t) for t in data["terms"]], data["offsets"], data["gaps"], data["tfs"], data["doc_len"])
+
+# Function to build the keyword index of every indexed hostel, aligned with
+# `id_map` labels. Each chunk of the projected cursor is tokenized straight into
+# compact (term, label, tf) arrays, so only postings (never texts) are held until
+# the single encode at the end.
+def build_lexical_index(collection, id_map, chunk_size=DEFAULT_CHUNK_SIZE):
+    terms, term_id = [], {}
+    doc_len = np.zeros(len(id_map), dtype=np.float32)
+    term_ids, labels, tfs = [np.empty(0, dtype=np.int32)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int32)]
+    for hostels in iter_hostel_chunks(collection, chunk_size, projection=LEXICAL_FIELDS):
+        found = id_map.labels_for([hostel["_id"] for hostel in hostels])
+        indexed = [(label, lexical_text(hostel)) for label, hostel in zip(found, hostels) if label != -1]
+        chunk_terms, chunk_labels, chunk_tfs, lengths = LexicalIndex._tokenize_docs(
+            [label for label, _ in indexed], [text for _, text in indexed], terms, term_id)
+        doc_len[np.array([label for label, _ in indexed], dtype=np.int64)] = lengths
+        term_ids.append(chunk_terms)
+        labels.append(chunk_labels)
+        tfs.append(chunk_tfs)
+    return LexicalIndex.from_postings(terms, np.concatenate(term_ids), np.concatenate(labels),
+                                      np.concatenate(tfs), doc_len)
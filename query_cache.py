@@ -0,0 +1,65 @@
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 3600
+
+_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]")
+
+# Function to normalize a query so "Girls PG, near college!" and
+# "girls pg near college" share one cache entry
+def normalize_query(text):
+    text = _PUNCTUATION.sub(" ", str(text).lower())
+    return " ".join(text.split())
+
+# Size-bounded LRU cache of query embeddings with a time-to-live, for one
+# embedder (vectors of different embedders must never be mixed).
+# One instance is shared by every Streamlit session, so access is locked.
+class QueryEmbeddingCache:
+    def __init__(self, embedder_name=None, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.embedder_name = embedder_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Function to get a cached embedding, or None on a miss or expired entry
+    def get(self, query):
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    # Function to store an embedding, evicting the least recently used entries
+    def put(self, query, embedding):
+        key = normalize_query(query)
+        embedding.setflags(write=False)  # shared between sessions, so never mutated in place
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "embedder": self.embedder_name,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+
+# HTTP statuses worth retrying: quota exhausted and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`.
+# `clock` and `sleep` can be replaced (e.g. by a fake clock in tests).
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    # Function to block until `tokens` tokens are available, then take them
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Sleeping exactly `wait` can refill a hair less than needed (float rounding)
+                if self.tokens >= tokens - 1e-9:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+# Function to decide whether an API error is transient (429/5xx, timeouts, dropped connections)
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # google.api_core exceptions carry the HTTP status in `code`, HTTP clients in `status_code`
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS
+
+# Function to call fn(*args), waiting on the rate limiter before every attempt and
+# retrying transient errors with jittered exponential backoff
+def call_with_retries(fn, *args, limiter=None, max_retries=5, base_delay=1.0, max_delay=60.0):
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,97 @@
+import os
+import time
+import streamlit as st
+import google.generativeai as genai
+from pymongo import MongoClient
+import embedder as embedders
+import index_store
+from hot_swap import LiveIndex, DEFAULT_WATCH_SECONDS
+from query_cache import QueryEmbeddingCache
+from document_cache import DocumentCache
+from search_sessions import SearchSessionCache
+
+# Load time and memory for every shared resource, filled in the first time
+# each one is created in this process
+RESOURCE_STATS = {}
+
+# Function to read the resident memory of this process in MB
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# Function to time a resource load and record how much memory it added
+def _record(name, start_time, rss_before, size_bytes=None):
+    rss_after = current_rss_mb()
+    stats = {"load_seconds": round(time.perf_counter() - start_time, 4)}
+    if rss_before is not None and rss_after is not None:
+        stats["rss_delta_mb"] = round(rss_after - rss_before, 2)
+    if size_bytes is not None:
+        stats["size_mb"] = round(size_bytes / (1024 * 1024), 2)
+    RESOURCE_STATS[name] = stats
+    print(f"✅ Loaded {name}: {stats}")
+
+# Configure Gemini once per process (st.cache_resource is shared by every session and rerun)
+@st.cache_resource(show_spinner=False)
+def configure_gemini(api_key):
+    start, rss_before = time.perf_counter(), current_rss_mb()
+    genai.configure(api_key=api_key)
+    _record("gemini", start, rss_before)
+    return True
+
+# One MongoClient (and connection pool) per URI per process
+@st.cache_resource(show_spinner=False)
+def get_mongo_client(uri):
+    start, rss_before = time.perf_counter(), current_rss_mb()
+    client = MongoClient(uri)
+    _record("mongo", start, rss_before)
+    return client
+
+# Function to get the hostel collection from the shared client
+def get_hostel_collection(uri, db_name="hostelDB", collection_name="hostels"):
+    return get_mongo_client(uri)[db_name][collection_name]
+
+# Load the published FAISS index bundle once per process (memory-mapped by default
+# so replicas share one copy through the page cache). The returned LiveIndex
+# swaps in newly published versions in the background; call .current() per run.
+@st.cache_resource(show_spinner=False)
+def get_live_index(mmap=True, interval=DEFAULT_WATCH_SECONDS):
+    start, rss_before = time.perf_counter(), current_rss_mb()
+    live_index = LiveIndex(mmap=mmap, interval=interval)
+    bundle = live_index.current()
+    index_path, _ = index_store.bundle_paths(bundle.meta.get("version"))
+    _record("faiss_index", start, rss_before,
+            size_bytes=os.path.getsize(index_path) + bundle.hostel_ids.nbytes
+            + (bundle.attributes.nbytes if bundle.attributes is not None else 0)
+            + (bundle.lexical.nbytes if bundle.lexical is not None else 0))
+    return live_index
+
+# One embedder per process ("gemini" also configures the Gemini API key)
+@st.cache_resource(show_spinner=False)
+def get_embedder(name="gemini", api_key=None):
+    if name == "gemini":
+        configure_gemini(api_key)
+    return embedders.get_embedder(name)
+
+# One query-embedding cache per embedder per process, shared by every session
+# (the embedder name keys the cached resource, so switching embedders never
+# serves vectors of the other one)
+@st.cache_resource(show_spinner=False)
+def get_query_cache(embedder_name="gemini"):
+    return QueryEmbeddingCache(embedder_name)
+
+# One cache of hostel documents per collection per process, in front of result
+# hydration; it follows the collection's change stream to drop edited hostels
+@st.cache_resource(show_spinner=False)
+def get_document_cache(uri, db_name="hostelDB", collection_name="hostels"):
+    cache = DocumentCache()
+    cache.follow(get_hostel_collection(uri, db_name, collection_name))
+    return cache
+
+# One store of ranked search results per process, used to page through results
+@st.cache_resource(show_spinner=False)
+def get_search_sessions():
+    return SearchSessionCache()
@@ -0,0 +1,206 @@
+import faiss
+import numpy as np
+import index_builder
+
+# Function to build the FAISS search parameters for an index, restricted to
+# `selector` and carrying the build's nprobe/efSearch (SearchParameters replace
+# the index's own settings, so they have to be passed along). widen=True scans
+# every IVF list / a deeper HNSW graph for very selective filters.
+def search_parameters(index, selector, search_params=None, widen=False, k=10):
+    search_params = search_params or {}
+    ivf = faiss.try_extract_index_ivf(index)
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    while isinstance(inner, faiss.IndexPreTransform):
+        inner = faiss.downcast_index(inner.index)
+    if ivf is not None:
+        nprobe = ivf.nlist if widen else search_params.get("nprobe", ivf.nprobe)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(inner, faiss.IndexHNSW):
+        ef_search = search_params.get("efSearch", inner.hnsw.efSearch)
+        if widen:
+            ef_search = max(ef_search, min(index.ntotal, 16 * k))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+# Function to get the rows (labels) that satisfy structured constraints and still
+# hold a hostel. Returns None when there is nothing to filter on.
+def filter_mask(bundle, ranges=None, any_of=None):
+    if bundle.attributes is None or not (ranges or any(any_of.values() if any_of else [])):
+        return None
+    mask = bundle.attributes.mask(ranges, any_of)
+    live = bundle.hostel_ids.raw.any(axis=1)
+    return mask & live[:len(mask)]
+
+# Function to search only among the labels allowed by `mask`, so the top-k is
+# always drawn from matching hostels. The mask becomes an IDSelectorBitmap that
+# FAISS checks during the scan. If an approximate index returns fewer than k hits
+# while more hostels match, the search is repeated with widened parameters.
+# `matching` is how many of the index's own labels the mask allows (a shard holds
+# only some of them); by default every allowed label is assumed to be in it.
+def filtered_search(index, queries, k, mask=None, search_params=None, matching=None):
+    queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, index.d)
+    if mask is None:
+        return index.search(queries, k)
+    matching = int(mask.sum()) if matching is None else matching
+    if matching == 0:
+        return (np.full((len(queries), k), np.inf, dtype="float32"),
+                np.full((len(queries), k), -1, dtype="int64"))
+
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    D, I = index.search(queries, k, params=search_parameters(index, selector, search_params, k=k))
+    expected = min(k, matching)
+    if (I[:, :expected] == -1).any():
+        D, I = index.search(queries, k, params=search_parameters(index, selector, search_params, widen=True, k=k))
+    return D, I
+
+# Function to convert a cosine similarity into the squared L2 distance FAISS
+# reports for unit-length embeddings (|a - b|^2 = 2 - 2 cos), and back
+def similarity_to_distance(similarity):
+    return 2.0 - 2.0 * similarity
+
+def distance_to_similarity(distance):
+    return 1.0 - distance / 2.0
+
+# Function to get every hostel within `max_distance` of each query (FAISS
+# range_search), best first and capped at `max_results`, instead of a fixed top-k.
+# Results come back like index.search: (D, I) shaped (queries, max_results) and
+# padded with inf / -1, so a query with only two close matches yields two hits.
+# Index types without range search fall back to a top-max_results search cut at
+# the radius.
+def range_filtered_search(index, queries, max_distance, max_results, mask=None, search_params=None):
+    queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, index.d)
+    D = np.full((len(queries), max_results), np.inf, dtype="float32")
+    I = np.full((len(queries), max_results), -1, dtype="int64")
+    if mask is not None and not mask.any():
+        return D, I
+
+    try:
+        if mask is None:
+            lims, distances, labels = index.range_search(queries, max_distance)
+        else:
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+            params = search_parameters(index, selector, search_params, k=max_results)
+            lims, distances, labels = index.range_search(queries, max_distance, params=params)
+    except RuntimeError:
+        D, I = filtered_search(index, queries, max_results, mask, search_params)
+        I = np.where(D <= max_distance, I, -1)
+        return np.where(I == -1, np.inf, D).astype("float32"), I
+
+    for q in range(len(queries)):
+        start, end = lims[q], lims[q + 1]
+        order = np.argsort(distances[start:end], kind="stable")[:max_results]
+        D[q, :len(order)] = distances[start:end][order]
+        I[q, :len(order)] = labels[start:end][order]
+    return D, I
+
+# Candidates pulled from a compressed/approximate index for exact re-ranking
+DEFAULT_RERANK_CANDIDATES = 200
+# Queries re-ranked together: bounds the gathered (queries, candidates, dim)
+# block, e.g. 64 x 200 x 768 float32 = 39 MB
+RERANK_QUERY_BATCH = 64
+
+# Function to re-score candidate labels with exact squared L2 distances against
+# full-precision vectors and keep the best k. `labels` is (queries, candidates)
+# padded with -1, as returned by index.search; the candidates of up to
+# `query_batch` queries are gathered in one read and scored together
+# (|v|^2 - 2 v.q + |q|^2).
+def exact_rerank(queries, labels, vector_store, k, query_batch=RERANK_QUERY_BATCH):
+    queries = np.ascontiguousarray(queries, dtype="float32").reshape(len(labels), -1)
+    distances = np.full(labels.shape, np.inf, dtype="float32")
+    for start in range(0, len(labels), query_batch):
+        batch, block = queries[start:start + query_batch], labels[start:start + query_batch]
+        valid = block != -1
+        vectors = np.zeros(block.shape + (queries.shape[1],), dtype="float32")
+        vectors[valid] = vector_store.gather(block[valid])
+        scores = ((vectors ** 2).sum(axis=2) - 2 * np.einsum("qcd,qd->qc", vectors, batch)
+                  + (batch ** 2).sum(axis=1)[:, None])
+        distances[start:start + query_batch] = np.where(valid, np.maximum(scores, 0), np.inf)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    D = np.take_along_axis(distances, order, axis=1)
+    I = np.where(np.isinf(D), -1, np.take_along_axis(labels, order, axis=1))
+    if k > labels.shape[1]:
+        pad = k - labels.shape[1]
+        D = np.pad(D, ((0, 0), (0, pad)), constant_values=np.inf)
+        I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+    return D, I
+
+# Function to search in two stages when the bundle keeps full-precision vectors:
+# pull `rerank_candidates` from the (compressed or approximate) index, then
+# re-rank them exactly and keep the top k. Without stored vectors it is a plain search.
+# A PCA-reduced index without stored vectors can't take max_distance: its
+# distances are measured in the reduced space.
+def two_stage_search(bundle, queries, k, mask=None, max_distance=None, city=None, query=None,
+                     rerank_candidates=DEFAULT_RERANK_CANDIDATES):
+    if max_distance is not None and bundle.vectors is None and index_builder.pca_dim(bundle.meta.get("factory", "")):
+        raise ValueError("A similarity threshold needs re-rank vectors on PCA-reduced indexes; "
+                         "rebuild with --rerank-vectors float32 or float16")
+    fetch = max(k, rerank_candidates) if bundle.vectors is not None else k
+    if bundle.shards is not None:
+        D, I = bundle.shards.search(queries, fetch, city=city, query=query, mask=mask, max_distance=max_distance)
+    elif max_distance is not None:
+        D, I = range_filtered_search(bundle.index, queries, max_distance, fetch, mask, bundle.meta.get("search_params"))
+    else:
+        D, I = filtered_search(bundle.index, queries, fetch, mask, bundle.meta.get("search_params"))
+    if bundle.vectors is None:
+        return D, I
+    D, I = exact_rerank(queries, I, bundle.vectors, k)
+    if max_distance is not None:
+        I = np.where(D <= max_distance, I, -1)
+        D = np.where(I == -1, np.inf, D).astype("float32")
+    return D, I
+
+# Function to keep the labels within `max_distance` of a query, in their order.
+# Distances come from the bundle's full-precision vectors; without them only
+# labels the (radius-limited) semantic search returned are known to be close.
+def within_distance(bundle, query_vector, labels, max_distance, semantic):
+    labels = np.asarray(labels, dtype="int64")
+    labels = labels[labels != -1]
+    if bundle.vectors is None:
+        return labels[np.isin(labels, semantic[semantic != -1])]
+    query_vector = np.asarray(query_vector, dtype="float32").reshape(-1)
+    distances = ((bundle.vectors.gather(labels) - query_vector) ** 2).sum(axis=1)
+    return labels[distances <= max_distance]
+
+# Constant of reciprocal rank fusion: a hit at rank r adds weight / (RRF_K + r)
+RRF_K = 60
+
+# Function to fuse ranked label lists with reciprocal rank fusion. Only ranks are
+# used, so BM25 scores and L2 distances never have to be put on one scale.
+def reciprocal_rank_fusion(rankings, k=10, weights=None):
+    fused = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, label in enumerate(int(label) for label in ranking if label != -1):
+            fused[label] = fused.get(label, 0.0) + weight / (RRF_K + rank + 1)
+    best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+    return [score for _, score in best], [label for label, _ in best]
+
+# Function to run the semantic (FAISS) and keyword (BM25) searches and fuse them.
+# query_vector=None (embedding service down or slow) falls back to keywords only;
+# a bundle without a keyword index falls back to FAISS only. With location shards
+# the semantic search goes to the shard of `city` (or of a city named in the
+# query), else to all shards. With max_distance, only hostels within that
+# distance take part in either ranking: keyword hits are measured against the
+# full-precision vectors, or (without them) kept only if the semantic search
+# found them too. Bundles with full-precision vectors re-rank the semantic
+# candidates exactly (two_stage_search).
+# Returns (scores, labels) shaped (1, k) and padded with -1, like index.search.
+def hybrid_search(bundle, query, query_vector, k=10, mask=None, candidates=None, weights=None, city=None,
+                  max_distance=None):
+    candidates = candidates or 2 * k
+    rankings = []
+    if query_vector is not None:
+        _, I = two_stage_search(bundle, query_vector, candidates, mask, max_distance, city=city, query=query)
+        rankings.append(I[0])
+    if bundle.lexical is not None:
+        _, labels = bundle.lexical.search(query, candidates, mask)
+        if max_distance is not None and query_vector is not None:
+            labels = within_distance(bundle, query_vector, labels, max_distance, semantic=I[0])
+        rankings.append(labels)
+    scores, labels = reciprocal_rank_fusion(rankings, k, weights)
+    D = np.zeros((1, k), dtype="float32")
+    I = np.full((1, k), -1, dtype="int64")
+    D[0, :len(scores)] = scores
+    I[0, :len(labels)] = labels
+    return D, I
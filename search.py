@@ -1,54 +1,188 @@
-import google.generativeai as genai
-import faiss
-import numpy as np
+import argparse
+import json
+import sys
+from itertools import islice
 from pymongo import MongoClient
-from bson import ObjectId
-import config 
-
-# Configure Gemini API
-genai.configure(api_key=config.GEMINI_API_KEY)
-
-# Function to generate embeddings
-def get_embedding(text):
-    response = genai.embed_content(
-        model="models/embedding-001",
-        content=text,
-        task_type="retrieval_document"
-    )
-    return np.array(response["embedding"], dtype="float32")
-
-# Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["hostelDB"]
-hostel_collection = db["hostels"]
-
-# Load FAISS index and hostel IDs
-index = faiss.read_index("hostel_index.faiss")
-hostel_ids = np.load("hostel_ids.npy")
-
-# User input
-query = input("🔍 Enter hostel search query: ")
-query_embedding = get_embedding(query).reshape(1, -1)
-
-# Perform FAISS search
-D, I = index.search(query_embedding, k=5)
-
-# Debug FAISS output
-print(f"FAISS Output - Distances: {D}, Indexes: {I}")
-
-# Retrieve matching hostels from MongoDB
-matching_hostels = []
-for i in I[0]:
-    if i < len(hostel_ids):  # Ensure valid index
-        hostel_id = hostel_ids[i]
-        hostel = hostel_collection.find_one({"_id": ObjectId(hostel_id)})
-        if hostel:
-            matching_hostels.append(hostel)
-
-# Display results
-if matching_hostels:
-    print("\n🔹 **Top Matches:**")
-    for hostel in matching_hostels:
-        print(f"- {hostel['name']} ({hostel['location']}): {hostel['description']}")
-else:
-    print("❌ No matching hostels found.")
+import config
+import index_store
+import retrieval
+from embedder import get_embedder
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from document_cache import DocumentCache
+from hydration import hydrate_labels
+from search_sessions import SearchSession, session_key, decode_cursor, DEFAULT_MAX_CANDIDATES
+from embeddings import (embed_in_batches, embed_with_cache, quota_limiter, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS,
+                        DEFAULT_REQUESTS_PER_MINUTE)
+
+DEFAULT_K = 5
+# Queries read, embedded, searched and written per step in batch mode
+DEFAULT_QUERY_CHUNK = 1000
+DEFAULT_OUTPUT = "search_results.jsonl"
+# Hostel fields written for every hit in batch mode
+RESULT_FIELDS = ("name", "location", "monthly_rent", "ratings")
+
+# Function to answer one query typed at the prompt
+def search_interactive(embedder, search_index, hostel_collection, k=DEFAULT_K, max_distance=None,
+                       document_cache=None):
+    query = input("🔍 Enter hostel search query: ")
+    query_embedding = embedder.embed_one(query).reshape(1, -1)
+
+    # Perform FAISS + keyword (BM25) search once, fused by rank; pages are slices of it
+    D, I = retrieval.hybrid_search(search_index, query, query_embedding, k=DEFAULT_MAX_CANDIDATES,
+                                   max_distance=max_distance)
+    session = SearchSession(session_key(search_index.version, query), I[0], D[0])
+
+    # Debug search output
+    print(f"Search Output - {len(session)} candidates, top fusion scores: {session.scores[:k]}")
+
+    offset = 0
+    while True:
+        labels, _, next_cursor = session.page(offset, k)
+
+        # Retrieve this page's hostels in rank order (from the index snapshot, or one MongoDB query)
+        matching_hostels, _ = hydrate_labels(search_index, hostel_collection, labels,
+                                             ("name", "location", "description"), document_cache)
+
+        # Display results
+        if matching_hostels:
+            print("\n🔹 **Top Matches:**" if offset == 0 else f"\n🔹 **Matches {offset + 1}-{offset + len(labels)}:**")
+            for hostel in matching_hostels:
+                print(f"- {hostel['name']} ({hostel['location']}): {hostel['description']}")
+        elif offset == 0:
+            print("❌ No matching hostels found.")
+
+        if next_cursor is None or input("➡️ Press Enter for more results, or q to quit: ").strip().lower() == "q":
+            return
+        _, offset = decode_cursor(next_cursor)
+
+# Function to read JSONL query records chunk by chunk (blank lines are skipped)
+def iter_query_chunks(lines, chunk_size=DEFAULT_QUERY_CHUNK):
+    records = (json.loads(line) for line in lines if line.strip())
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+# Function to run every query of a JSONL file: per chunk, the queries are
+# embedded in batches, searched with one matrix index.search, and their hits
+# read from the index snapshot or fetched with one $in query (hostels already
+# in `document_cache` are not fetched again); one JSONL result line is streamed
+# per query.
+# Bundles with full-precision vectors re-rank the candidates exactly.
+# With max_distance, each query returns only the hostels within that distance
+# (at most k) instead of a fixed top-k.
+def search_batch(lines, out, embedder, search_index, hostel_collection, k=DEFAULT_K, field="query",
+                 chunk_size=DEFAULT_QUERY_CHUNK, cache=None, max_distance=None, document_cache=None,
+                 **batch_options):
+    totals = {"queries": 0, "failed": 0}
+    # One quota for the whole run, not a fresh burst per chunk
+    if batch_options.get("limiter") is None:
+        batch_options["limiter"] = quota_limiter(batch_options.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE))
+    for records in iter_query_chunks(lines, chunk_size):
+        texts = [str(record.get(field, "")) for record in records]
+        if cache is None:
+            vectors, errors, _ = embed_in_batches(texts, embedder, **batch_options)
+        else:
+            vectors, errors, _ = embed_with_cache(texts, cache, embedder, **batch_options)
+
+        # One matrix search for every query of the chunk that could be embedded
+        embedded = [i for i, vector in enumerate(vectors) if vector is not None]
+        hits = {}
+        if embedded:
+            D, I = retrieval.two_stage_search(search_index, [vectors[i] for i in embedded], k,
+                                              max_distance=max_distance)
+            for i, row_d, row_i in zip(embedded, D, I):
+                hits[i] = list(zip(row_d, search_index.hostel_ids.object_ids(row_i)))
+        labels = sorted(set(I[I != -1].tolist())) if embedded else []
+        hostels = {hostel["_id"]: hostel for hostel in
+                   hydrate_labels(search_index, hostel_collection, labels, RESULT_FIELDS, document_cache)[0]}
+
+        for i, record in enumerate(records):
+            result = dict(record)
+            if i not in hits:
+                result["error"] = str(errors.get(i, "embedding failed"))
+                totals["failed"] += 1
+            else:
+                result["results"] = []
+                for distance, hostel_id in hits[i]:
+                    hostel = hostels.get(hostel_id)
+                    if hostel:
+                        hit = {"hostel_id": str(hostel_id), "distance": float(distance),
+                               "similarity": round(float(retrieval.distance_to_similarity(distance)), 4)}
+                        hit.update((name, hostel.get(name)) for name in RESULT_FIELDS)
+                        result["results"].append(hit)
+            out.write(json.dumps(result, default=str) + "\n")
+        out.flush()
+        totals["queries"] += len(records)
+        print(f"📦 {totals['queries']} queries searched", file=sys.stderr)
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Search hostels from the prompt or from a JSONL file of queries")
+    parser.add_argument("--queries", default=None,
+                        help="JSONL file of queries for batch mode ('-' = stdin); without it, asks at the prompt")
+    parser.add_argument("--field", default="query",
+                        help="JSON field that holds the query text in batch mode")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="where batch results are written as JSONL ('-' = stdout)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K,
+                        help="hostels returned per query (the cap when --min-similarity is set)")
+    parser.add_argument("--min-similarity", type=float, default=None,
+                        help="return only hostels at least this similar to the query (cosine, 0-1) instead of a fixed top-k")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_QUERY_CHUNK,
+                        help="queries embedded and searched per step in batch mode")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="queries sent per embedding request")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="number of embedding requests kept in flight")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="embedding requests per minute allowed by the API quota (0 = unlimited)")
+    parser.add_argument("--cache", default=None,
+                        help=f"SQLite embedding cache to read and fill in batch mode (e.g. {DEFAULT_CACHE_PATH})")
+    args = parser.parse_args()
+
+    # Create the embedder configured for this deployment
+    embedder = get_embedder(config.EMBEDDER, api_key=config.GEMINI_API_KEY)
+
+    # Connect to MongoDB
+    client = MongoClient("mongodb://localhost:27017/")
+    db = client["hostelDB"]
+    hostel_collection = db["hostels"]
+
+    # Load FAISS index and hostel IDs, and make sure they were built with the same embedder
+    search_index = index_store.load_current_bundle(mmap=config.INDEX_MMAP)
+    index_store.check_embedder(search_index.meta, embedder)
+
+    max_distance = None
+    if args.min_similarity is not None:
+        max_distance = retrieval.similarity_to_distance(args.min_similarity)
+
+    # Hostels hit by many queries are fetched from MongoDB once
+    document_cache = DocumentCache()
+
+    if args.queries is None:
+        search_interactive(embedder, search_index, hostel_collection, k=args.k, max_distance=max_distance,
+                           document_cache=document_cache)
+        return
+
+    cache = EmbeddingCache(args.cache) if args.cache else None
+    source = sys.stdin if args.queries == "-" else open(args.queries)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        totals = search_batch(source, out, embedder, search_index, hostel_collection, k=args.k, field=args.field,
+                              chunk_size=args.chunk_size, cache=cache, max_distance=max_distance,
+                              document_cache=document_cache,
+                              batch_size=args.batch_size,
+                              workers=args.workers, requests_per_minute=args.rpm, limiter=quota_limiter(args.rpm))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+    print(f"✅ Searched {totals['queries']} queries ({totals['failed']} failed)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from query_cache import normalize_query
+
+DEFAULT_PAGE_SIZE = 10
+# Ranked hostels kept per search; pages beyond this need a new search
+DEFAULT_MAX_CANDIDATES = 200
+# Memory budget for all sessions together (labels + scores)
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 1800
+
+# Function to identify a search: the index version, the normalized query and
+# every option that changes the ranking (filters, sort, threshold)
+def session_key(version, query, **options):
+    payload = json.dumps([version, normalize_query(query), options], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+# Function to build an opaque page cursor ("<session key>:<offset>")
+def encode_cursor(key, offset):
+    return f"{key}:{offset}"
+
+# Function to split a cursor into its session key and offset
+def decode_cursor(cursor):
+    key, _, offset = str(cursor).partition(":")
+    return key, int(offset or 0)
+
+# The ranked candidates of one search: labels and scores, best first
+class SearchSession:
+    def __init__(self, key, labels, scores):
+        labels = np.asarray(labels, dtype=np.int64)
+        keep = labels != -1
+        self.key = key
+        self.labels = labels[keep]
+        self.scores = np.asarray(scores, dtype=np.float32)[keep]
+        self.labels.setflags(write=False)
+        self.scores.setflags(write=False)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def nbytes(self):
+        return self.labels.nbytes + self.scores.nbytes
+
+    # Function to get one page: (labels, scores, cursor of the next page or None)
+    def page(self, offset=0, page_size=DEFAULT_PAGE_SIZE):
+        end = offset + page_size
+        next_cursor = encode_cursor(self.key, end) if end < len(self.labels) else None
+        return self.labels[offset:end], self.scores[offset:end], next_cursor
+
+# LRU cache of search sessions bounded by total bytes and a time-to-live, so
+# later pages of a search are served by slicing the stored candidate list.
+# One instance is shared by every Streamlit session, so access is locked.
+class SearchSessionCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Function to get a live session, or None on a miss or expired session
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    # Function to store a session, evicting the least recently used ones over the budget
+    def put(self, key, labels, scores):
+        session = SearchSession(key, labels, scores)
+        with self._lock:
+            if key in self._sessions:
+                self._drop(key)
+            self._sessions[key] = (time.monotonic(), session)
+            self._bytes += session.nbytes
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._drop(next(iter(self._sessions)))
+        return session
+
+    def _drop(self, key):
+        _, session = self._sessions.pop(key)
+        self._bytes -= session.nbytes
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+import index_builder
+from ingest import iter_hostel_chunks, DEFAULT_CHUNK_SIZE
+from retrieval import filtered_search, range_filtered_search
+
+ROUTER_FILE = "router.json"
+OTHER_SHARD = "other"
+DEFAULT_MIN_SHARD_SIZE = 1000
+DEFAULT_FANOUT_WORKERS = 4
+
+# Function to get the city of a location ("Kolkata, West Bengal" -> "kolkata")
+def city_of(location):
+    return str(location or "").split(",")[0].strip().lower()
+
+# Function to turn a shard key into a safe file name
+def _shard_file(key):
+    return re.sub(r"[^a-z0-9]+", "_", key).strip("_") + ".faiss"
+
+# Location-sharded index: one ID-mapped FAISS index per city (cities with few
+# listings share the "other" shard), all using the bundle's global labels so the
+# hostel IDs, attributes and keyword index stay shared. The router maps a city
+# to its shard; queries without a known city fan out to every shard in a thread
+# pool (FAISS releases the GIL while searching) and the per-shard top-k are merged.
+class ShardedIndex:
+    def __init__(self, shards, cities, search_params=None, workers=DEFAULT_FANOUT_WORKERS):
+        self.shards = shards
+        self.cities = cities
+        self.search_params = search_params or {}
+        self.d = next(iter(shards.values())).d if shards else 0
+        # Labels of each shard, read once and dropped when the shard changes
+        self._labels = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards))))
+
+    @property
+    def ntotal(self):
+        return sum(shard.ntotal for shard in self.shards.values())
+
+    # Function to get the shard of a city, or None if the city is unknown
+    def shard_for(self, city):
+        return self.cities.get(city_of(city)) if city else None
+
+    # Function to find a known city named in a free-text query ("hostels in pune")
+    def route(self, query):
+        text = " " + re.sub(r"[^a-z0-9]+", " ", str(query).lower()) + " "
+        for city in sorted(self.cities, key=len, reverse=True):
+            if f" {city} " in text:
+                return self.cities[city]
+        return None
+
+    # Function to search one shard (labels outside the mask are skipped)
+    def _search_shard(self, key, queries, k, mask, max_distance=None):
+        if max_distance is not None:
+            return range_filtered_search(self.shards[key], queries, max_distance, k, mask, self.search_params.get(key))
+        return filtered_search(self.shards[key], queries, k, mask, self.search_params.get(key),
+                               self._matching(key, mask))
+
+    # Function to count the labels of one shard that `mask` allows, so a shard
+    # holding fewer matches than k is not searched again with widened parameters
+    def _matching(self, key, mask):
+        if mask is None:
+            return None
+        labels = self._labels.get(key)
+        if labels is None:
+            labels = self._labels[key] = index_builder.index_labels(self.shards[key])
+        labels = labels[(labels >= 0) & (labels < len(mask))]
+        return int(np.count_nonzero(mask[labels]))
+
+    # Function to search the shard of `city` (or the city named in `query`), or
+    # every shard in parallel when there is none, and merge the top-k by distance
+    def search(self, queries, k, city=None, query=None, mask=None, max_distance=None):
+        queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.d)
+        key = self.shard_for(city) or (self.route(query) if query else None)
+        if key is not None:
+            return self._search_shard(key, queries, k, mask, max_distance)
+
+        results = list(self._pool.map(lambda key: self._search_shard(key, queries, k, mask, max_distance),
+                                      self.shards))
+        if not results:
+            return (np.full((len(queries), k), np.inf, dtype="float32"),
+                    np.full((len(queries), k), -1, dtype="int64"))
+        D = np.concatenate([D for D, _ in results], axis=1)
+        I = np.concatenate([I for _, I in results], axis=1)
+        D[I == -1] = np.inf
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    # Function to tell whether every shard can remove and replace vectors (not HNSW
+    # or IVF under an IDMap2 wrapper)
+    def supports_removal(self):
+        return all(index_builder.supports_removal(shard) for shard in self.shards.values())
+
+    # Function to move labels to the shard of their (new) location (used by the updater)
+    def upsert(self, labels, vectors, locations):
+        self.remove(labels)
+        keys = [self.shard_for(location) or OTHER_SHARD for location in locations]
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        for key in set(keys):
+            if key not in self.shards:
+                self.shards[key] = faiss.IndexIDMap2(faiss.IndexFlatL2(self.d))
+            rows = [row for row, row_key in enumerate(keys) if row_key == key]
+            self.shards[key].add_with_ids(vectors[rows], np.asarray(labels, dtype="int64")[rows])
+            self._labels.pop(key, None)
+
+    # Function to drop labels from whichever shard holds them
+    def remove(self, labels):
+        if not self.supports_removal():
+            raise ValueError("The location shards can't remove or replace vectors; rebuild with embeddings.py instead")
+        labels = np.asarray(labels, dtype="int64")
+        for key, shard in self.shards.items():
+            if shard.remove_ids(labels):
+                self._labels.pop(key, None)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        shards = {}
+        for key, shard in self.shards.items():
+            faiss.write_index(shard, os.path.join(directory, _shard_file(key)))
+            shards[key] = {"file": _shard_file(key), "count": int(shard.ntotal),
+                           "search_params": self.search_params.get(key, {})}
+        with open(os.path.join(directory, ROUTER_FILE), "w") as f:
+            json.dump({"shards": shards, "cities": self.cities}, f, indent=2)
+
+    # Function to load saved shards; `read_index` lets the caller memory-map them
+    @classmethod
+    def load(cls, directory, read_index=faiss.read_index):
+        with open(os.path.join(directory, ROUTER_FILE)) as f:
+            router = json.load(f)
+        shards, search_params = {}, {}
+        for key, info in router["shards"].items():
+            path = os.path.join(directory, info["file"])
+            shards[key] = read_index(path)
+            search_params[key] = info.get("search_params", {})
+            index_builder.apply_search_params(shards[key], search_params[key])
+        return cls(shards, router["cities"], search_params)
+
+# Function to read the city of every indexed hostel (label -> city, "" if unknown)
+def read_cities(collection, id_map, chunk_size=DEFAULT_CHUNK_SIZE):
+    cities = np.full(len(id_map), "", dtype=object)
+    for hostels in iter_hostel_chunks(collection, chunk_size, projection={"location": 1}):
+        labels = id_map.labels_for([hostel["_id"] for hostel in hostels])
+        for label, hostel in zip(labels, hostels):
+            if label != -1:
+                cities[label] = city_of(hostel.get("location"))
+    return cities
+
+# Function to build one index per city from the build's vectors (row = label).
+# Cities with fewer than `min_shard_size` listings are pooled into the "other"
+# shard. Each shard gets the factory that `spec` resolves to for its own size
+# (and its own PCA stage with reduce_dim).
+def build_shards(vectors, cities, spec="flat", min_shard_size=DEFAULT_MIN_SHARD_SIZE, train_size=None,
+                 chunk_size=10000, nprobe=index_builder.DEFAULT_NPROBE, ef_search=index_builder.DEFAULT_EF_SEARCH,
+                 reduce_dim=None):
+    names, counts = np.unique(cities.astype(str), return_counts=True)
+    router = {name: (name if count >= min_shard_size and name else OTHER_SHARD)
+              for name, count in zip(names, counts) if name}
+    keys = np.array([router.get(city, OTHER_SHARD) for city in cities.astype(str)])
+
+    shards, search_params = {}, {}
+    for key in sorted(set(keys)):
+        rows = np.flatnonzero(keys == key)
+        factory = index_builder.resolve_factory(spec, vectors.shape[1], len(rows), reduce_dim)
+        print(f"🧩 Building shard {key} ({len(rows)} hostels, {factory})")
+        shard_vectors = np.asarray(vectors[rows], dtype="float32")
+        shards[key], factory = index_builder.build_index(shard_vectors, factory, train_size, chunk_size, labels=rows)
+        search_params[key] = index_builder.default_search_params(factory, nprobe, ef_search)
+        index_builder.apply_search_params(shards[key], search_params[key])
+    return ShardedIndex(shards, router, search_params)
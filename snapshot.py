@@ -0,0 +1,113 @@
+import os
+import bson
+import numpy as np
+from hydration import CARD_FIELDS
+from ingest import iter_hostel_chunks, DEFAULT_CHUNK_SIZE
+
+# Fields kept in the snapshot: everything the result cards render or filter on
+SNAPSHOT_FIELDS = CARD_FIELDS
+# Function to get the (offset, length) table that sits next to a snapshot file
+def table_path(path):
+    return os.path.splitext(path)[0] + ".idx.npy"
+
+# Render-ready copy of the card fields of every indexed hostel, written with the
+# index build so results can be shown without asking MongoDB. Each hostel is
+# one BSON record (row = label); records lie back to back in a .bin file and an
+# (offset, length) table in a .idx.npy points at them. Both are memory-mapped,
+# so a page of results reads only its own records. Length 0 = no record.
+# Records written by the updater are held in `overrides` until the next save,
+# which writes a compacted file: only the live record of each row.
+class HostelSnapshot:
+    def __init__(self, blob, table, fields=SNAPSHOT_FIELDS, overrides=None):
+        self.blob = blob
+        self.table = table
+        self.fields = tuple(fields)
+        self.overrides = overrides if overrides is not None else {}
+
+    @classmethod
+    def empty(cls, rows, fields=SNAPSHOT_FIELDS):
+        return cls(np.zeros(0, dtype=np.uint8), np.zeros((rows, 2), dtype=np.int64), fields)
+
+    def __len__(self):
+        return max([len(self.table)] + [label + 1 for label in self.overrides])
+
+    @property
+    def nbytes(self):
+        return self.blob.nbytes + self.table.nbytes
+
+    # Function to encode the snapshot fields of one hostel
+    def encode(self, hostel):
+        return bson.encode({field: hostel[field] for field in self.fields if field in hostel})
+
+    # Function to record new documents for labels (the updater's upserts)
+    def set_rows(self, labels, hostels):
+        for label, hostel in zip(np.asarray(labels).tolist(), hostels):
+            self.overrides[label] = self.encode(hostel)
+
+    # Function to drop the records of deleted hostels
+    def clear_rows(self, labels):
+        for label in np.asarray(labels).tolist():
+            self.overrides[label] = b""
+
+    # Function to read the records of many labels: one dict per label, None where there is none
+    def get_many(self, labels):
+        records = []
+        for label in np.asarray(labels, dtype=np.int64).tolist():
+            if label in self.overrides:
+                raw = self.overrides[label]
+            elif 0 <= label < len(self.table):
+                offset, length = self.table[label]
+                raw = self.blob[offset:offset + length].tobytes()
+            else:
+                raw = b""
+            records.append(bson.decode(raw) if raw else None)
+        return records
+
+    # Function to write the snapshot to `path` (records) and its table, label by
+    # label: each row keeps its override or its record from the file, so records
+    # replaced or cleared by the updater are left behind
+    def save(self, path):
+        table = np.zeros((len(self), 2), dtype=np.int64)
+        source = np.asarray(self.table).tolist()
+        end = 0
+        with open(path, "wb") as f:
+            for label in range(len(table)):
+                if label in self.overrides:
+                    raw = self.overrides[label]
+                elif label < len(source):
+                    offset, length = source[label]
+                    raw = self.blob[offset:offset + length]
+                else:
+                    continue
+                if len(raw):
+                    f.write(raw)
+                    table[label] = (end, len(raw))
+                    end += len(raw)
+        np.save(table_path(path), table)
+
+    @classmethod
+    def load(cls, path, fields=SNAPSHOT_FIELDS):
+        table = np.load(table_path(path), mmap_mode="r")
+        # An empty file can't be memory-mapped
+        blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+        return cls(blob, table, fields)
+
+# Function to write the snapshot of every indexed hostel to `path`, streamed from
+# MongoDB chunk by chunk (records follow the collection order, the table maps
+# labels to them), and open it
+def build_snapshot(collection, id_map, path, chunk_size=DEFAULT_CHUNK_SIZE, fields=SNAPSHOT_FIELDS):
+    snapshot = HostelSnapshot.empty(len(id_map), fields)
+    table = np.zeros((len(id_map), 2), dtype=np.int64)
+    end = 0
+    with open(path, "wb") as f:
+        for hostels in iter_hostel_chunks(collection, chunk_size, projection={field: 1 for field in fields}):
+            labels = id_map.labels_for([hostel["_id"] for hostel in hostels])
+            for label, hostel in zip(labels.tolist(), hostels):
+                if label == -1:
+                    continue
+                raw = snapshot.encode(hostel)
+                f.write(raw)
+                table[label] = (end, len(raw))
+                end += len(raw)
+    np.save(table_path(path), table)
+    return HostelSnapshot.load(path, fields)
@@ -0,0 +1,41 @@
+import numpy as np
+from embedder import get_embedder
+from embeddings import embed_in_batches
+
+# Local embedder that fails some requests, so the retry and per-item fallback
+# paths run without calling the Gemini API
+class FlakyEmbedder:
+    def __init__(self, embedder, bad_text):
+        self.embedder = embedder
+        self.bad_text = bad_text
+        self.model = embedder.model
+        self.calls = 0
+
+    def embed(self, texts, task_type="retrieval_document"):
+        self.calls += 1
+        if self.bad_text in texts:
+            raise ValueError("bad document in batch")
+        return self.embedder.embed(texts, task_type)
+
+    def embed_one(self, text, task_type="retrieval_document"):
+        self.calls += 1
+        if text == self.bad_text:
+            raise ValueError("bad document")
+        return self.embedder.embed_one(text, task_type)
+
+embedder = get_embedder("hashing")
+texts = [f"hostel {i} with wifi near campus" for i in range(250)]
+
+# Batches keep the input order and match embedding texts one by one
+vectors, errors, stats = embed_in_batches(texts, embedder, batch_size=100, workers=4, requests_per_minute=0)
+expected = np.stack([embedder.embed_one(text) for text in texts])
+assert not errors and np.allclose(np.stack(vectors), expected)
+print("✅ Batched embeddings match one-by-one embeddings:", stats)
+
+# A failing batch is retried item by item, so only the bad document is lost
+flaky = FlakyEmbedder(embedder, texts[42])
+vectors, errors, stats = embed_in_batches(texts, flaky, batch_size=100, workers=2, requests_per_minute=0,
+                                          max_retries=0)
+assert list(errors) == [42] and vectors[42] is None
+assert sum(vector is not None for vector in vectors) == len(texts) - 1
+print(f"✅ One bad document lost out of {len(texts)} ({flaky.calls} embedding calls):", stats)
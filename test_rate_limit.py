@@ -0,0 +1,64 @@
+import threading
+from embedder import get_embedder
+from embeddings import embed_in_batches
+from rate_limit import TokenBucket, call_with_retries
+
+# Clock that only moves when someone sleeps, so timings are exact on any machine
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+# A bucket of 5 tokens refilling at 20/s hands out the burst at once, then 20 per second
+clock = FakeClock()
+bucket = TokenBucket(rate=20, capacity=5, clock=clock, sleep=clock.sleep)
+for _ in range(25):
+    bucket.acquire()
+assert abs(clock.now - 1.0) < 1e-6, clock.now
+print(f"✅ 25 tokens at 20/s with a burst of 5 took {clock.now:.2f}s")
+
+# Transient errors (429) are retried, permanent ones are raised at once
+class QuotaError(Exception):
+    code = 429
+
+attempts = []
+def flaky():
+    attempts.append(1)
+    if len(attempts) < 3:
+        raise QuotaError("quota exhausted")
+    return "ok"
+assert call_with_retries(flaky, max_retries=5, base_delay=0.01) == "ok" and len(attempts) == 3
+try:
+    call_with_retries(lambda: 1 / 0, max_retries=5, base_delay=0.01)
+    raise AssertionError("ZeroDivisionError was retried away")
+except ZeroDivisionError:
+    pass
+print("✅ 429s are retried with backoff, other errors are raised")
+
+# embed_in_batches keeps to the requests-per-minute quota: 6 batches at 120 rpm
+# (2/s, burst of 2) need 2 seconds
+embedder = get_embedder("hashing")
+texts = [f"hostel {i}" for i in range(60)]
+clock = FakeClock()
+limiter = TokenBucket(rate=2, clock=clock, sleep=clock.sleep)
+vectors, errors, stats = embed_in_batches(texts, embedder, batch_size=10, workers=1, limiter=limiter)
+assert not errors and abs(clock.now - 2.0) < 1e-6, clock.now
+print(f"✅ Embedding requests stayed within the quota: 6 requests took {clock.now:.2f}s")
+
+# Consecutive calls sharing one limiter (one per streamed chunk) share the quota:
+# the burst is spent once, so 5 chunks of 6 requests need (30 - 2) / 2 = 14 seconds
+clock = FakeClock()
+limiter = TokenBucket(rate=2, clock=clock, sleep=clock.sleep)
+for _ in range(5):
+    vectors, errors, stats = embed_in_batches(texts, embedder, batch_size=10, workers=1, limiter=limiter)
+    assert not errors
+assert abs(clock.now - 14.0) < 1e-6, clock.now
+print(f"✅ 5 chunks with one limiter stayed within the quota: 30 requests took {clock.now:.2f}s")
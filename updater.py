@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+import config
+import index_builder
+import index_store
+from embedder import get_embedder, EMBEDDERS
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from embeddings import format_hostel, embed_in_batches, embed_with_cache, quota_limiter, DEFAULT_REQUESTS_PER_MINUTE
+from attributes import ATTRIBUTE_FIELDS
+from ingest import EMBED_FIELDS, latest_watermark, find_edited_since
+from lexical_index import lexical_text
+from snapshot import HostelSnapshot, SNAPSHOT_FIELDS
+from vector_store import VectorStore
+
+RESUME_TOKEN_PATH = "hostel_index.resume.json"
+# Change-stream events are applied together once this many arrive or this much time passes
+DEFAULT_FLUSH_EVENTS = 100
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_POLL_SECONDS = 5.0
+# Applied changes are published at most this often: every publish writes a full bundle
+DEFAULT_PUBLISH_SECONDS = 30.0
+
+# Keeps the saved index in step with MongoDB by re-embedding only the hostels
+# that changed. Labels are rows of the HostelIdMap, so an edited hostel keeps
+# its label and a deleted one leaves an empty slot instead of renumbering rows.
+class IndexUpdater:
+    def __init__(self, embedder, cache=None, root=index_store.VERSIONS_DIR,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, publish_seconds=DEFAULT_PUBLISH_SECONDS):
+        self.embedder = embedder
+        self.cache = cache
+        # Every batch of changes draws on the same embedding quota
+        self.requests_per_minute = requests_per_minute
+        self.limiter = quota_limiter(requests_per_minute)
+        self.root = root
+        self.publish_seconds = publish_seconds
+        self._published_at = None
+        # Changes since the last save, re-applied if another build is published meanwhile
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+        self._load()
+
+    # Function to load the current published bundle
+    def _load(self):
+        bundle = index_store.load_current_bundle(root=self.root)
+        index_store.check_embedder(bundle.meta, self.embedder)
+        self.version = bundle.meta.get("version")
+        self.meta = bundle.meta
+        if not index_builder.supports_removal(bundle.index):
+            raise ValueError(f"This {self.meta.get('factory', '')} index can't remove or replace vectors (HNSW, or IVF "
+                             "wrapped in IDMap2 by an older build); rebuild with embeddings.py instead")
+        if bundle.shards is not None and not bundle.shards.supports_removal():
+            raise ValueError("The location shards can't remove or replace vectors; rebuild with embeddings.py instead")
+        self.index = index_store.to_id_mapped(bundle.index)
+        self.hostel_ids = bundle.hostel_ids
+        self.attributes = bundle.attributes
+        self.lexical = bundle.lexical
+        self.shards = bundle.shards
+        self.vectors = bundle.vectors
+        self.snapshot = bundle.snapshot
+
+    # Function to re-embed and upsert a list of full hostel documents
+    def upsert(self, hostels):
+        if not hostels:
+            return 0
+        for hostel in hostels:
+            self._pending_upserts[hostel["_id"]] = hostel
+            self._pending_deletes.discard(hostel["_id"])
+        texts = [format_hostel(hostel) for hostel in hostels]
+        if self.cache is None:
+            vectors, errors, _ = embed_in_batches(texts, self.embedder, requests_per_minute=self.requests_per_minute,
+                                                  limiter=self.limiter)
+        else:
+            vectors, errors, _ = embed_with_cache(texts, self.cache, self.embedder,
+                                                  requests_per_minute=self.requests_per_minute, limiter=self.limiter)
+        for position, e in errors.items():
+            print(f"⚠️ Failed to embed {hostels[position].get('name')}, keeping its old vector: {e}")
+
+        embedded = [(hostel["_id"], vector) for hostel, vector in zip(hostels, vectors) if vector is not None]
+        if not embedded:
+            return 0
+        labels = self.hostel_ids.labels_for([hostel_id for hostel_id, _ in embedded])
+        new = labels == -1
+        if new.any():
+            labels[new] = self.hostel_ids.append([hostel_id for (hostel_id, _), is_new in zip(embedded, new) if is_new])
+        self.index.remove_ids(labels)
+        self.index.add_with_ids(np.array([vector for _, vector in embedded], dtype="float32"), labels)
+        by_id = {hostel["_id"]: hostel for hostel in hostels}
+        documents = [by_id[hostel_id] for hostel_id, _ in embedded]
+        if self.attributes is not None:
+            self.attributes.set_rows(labels, documents)
+        if self.lexical is not None:
+            self.lexical.update(labels, [lexical_text(hostel) for hostel in documents])
+        if self.snapshot is not None:
+            self.snapshot.set_rows(labels, documents)
+        if self.vectors is not None:
+            self.vectors.set_rows(labels, [vector for _, vector in embedded])
+        if self.shards is not None:
+            self.shards.upsert(labels, [vector for _, vector in embedded], [hostel.get("location") for hostel in documents])
+        return len(labels)
+
+    # Function to drop hostels from the index
+    def delete(self, hostel_ids):
+        for hostel_id in hostel_ids:
+            self._pending_upserts.pop(hostel_id, None)
+            self._pending_deletes.add(hostel_id)
+        labels = self.hostel_ids.labels_for(hostel_ids)
+        labels = labels[labels != -1]
+        if len(labels):
+            self.hostel_ids.clear(labels)
+            self.index.remove_ids(labels)
+            if self.attributes is not None:
+                self.attributes.clear_rows(labels)
+            if self.lexical is not None:
+                self.lexical.update(labels)
+            if self.snapshot is not None:
+                self.snapshot.clear_rows(labels)
+            if self.shards is not None:
+                self.shards.remove(labels)
+        return len(labels)
+
+    # Function to list the ObjectIds of every hostel currently in the index
+    def indexed_ids(self):
+        return self.hostel_ids.object_ids(self.hostel_ids.live_labels())
+
+    # Function to publish the updated bundle. If another build (embeddings.py) was
+    # published since this one was loaded, it is loaded instead and the changes
+    # since the last save are applied to it, so the newer build is not overwritten.
+    def save(self):
+        current = index_store.current_version(self.root)
+        if current != self.version:
+            upserts, deletes = list(self._pending_upserts.values()), list(self._pending_deletes)
+            print(f"⚠️ Index version {current} was published after {self.version} was loaded; "
+                  f"re-applying {len(upserts) + len(deletes)} changes to it")
+            self._load()
+            self.upsert(upserts)
+            self.delete(deletes)
+        self.version = index_store.publish_bundle(self.index, self.hostel_ids, self.meta, attributes=self.attributes,
+                                                  lexical=self.lexical, shards=self.shards, vectors=self.vectors,
+                                                  snapshot=self.snapshot, root=self.root)
+        self._pending_upserts, self._pending_deletes = {}, set()
+        self._published_at = time.monotonic()
+        # The published files hold the upserted vectors and records now: map them
+        # instead of keeping them in memory as overrides
+        index_path, _ = index_store.bundle_paths(self.version, root=self.root)
+        if self.vectors is not None:
+            self.vectors = VectorStore.load(index_store.vectors_path(index_path))
+        if self.snapshot is not None:
+            self.snapshot = HostelSnapshot.load(index_store.snapshot_path(index_path), self.snapshot.fields)
+
+    # Function to count the hostels changed since the last save
+    def pending_changes(self):
+        return len(self._pending_upserts) + len(self._pending_deletes)
+
+    # Function to save only if there are unpublished changes and the last publish
+    # was at least publish_seconds ago, so a stream of small edits is coalesced
+    # into one new version per interval. Returns True if it published.
+    def save_if_due(self):
+        changes = self.pending_changes()
+        if not changes:
+            return False
+        if self._published_at is not None and time.monotonic() - self._published_at < self.publish_seconds:
+            return False
+        self.save()
+        print(f"📦 Published index version {self.version} with {changes} changed hostels")
+        return True
+
+def _load_resume_token():
+    if os.path.exists(RESUME_TOKEN_PATH):
+        with open(RESUME_TOKEN_PATH) as f:
+            return json.load(f)
+    return None
+
+def _save_resume_token(token):
+    tmp_path = RESUME_TOKEN_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(token, f, default=str)
+    os.replace(tmp_path, RESUME_TOKEN_PATH)
+
+# Function to apply a batch of change-stream events (published later by save_if_due)
+def apply_events(updater, events):
+    upserts, deletes = {}, set()
+    for event in events:
+        hostel_id = event["documentKey"]["_id"]
+        if event["operationType"] == "delete":
+            deletes.add(hostel_id)
+            upserts.pop(hostel_id, None)
+        elif event.get("fullDocument") is not None:
+            upserts[hostel_id] = event["fullDocument"]
+            deletes.discard(hostel_id)
+    changed = updater.upsert(list(upserts.values())) + updater.delete(deletes)
+    if changed:
+        print(f"🔄 Applied {len(upserts)} upserts and {len(deletes)} deletes ({updater.index.ntotal} hostels indexed)")
+
+# Function to follow a MongoDB change stream (needs a replica set, e.g. Atlas).
+# The resume token is only saved once the events before it are published, so a
+# restart replays whatever was applied but not yet published.
+def watch_changes(updater, collection, flush_events=DEFAULT_FLUSH_EVENTS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    with collection.watch(pipeline, full_document="updateLookup",
+                          resume_after=_load_resume_token(), max_await_time_ms=500) as stream:
+        print("👀 Watching hostel change stream")
+        events, first_event_at, applied_token = [], None, None
+        while stream.alive:
+            event = stream.try_next()
+            if event is not None:
+                events.append(event)
+                first_event_at = first_event_at or time.monotonic()
+            # Flush once enough events arrived or the oldest pending one waited long enough
+            due = first_event_at is not None and time.monotonic() - first_event_at >= flush_seconds
+            if events and (len(events) >= flush_events or due):
+                apply_events(updater, events)
+                applied_token = stream.resume_token
+                events, first_event_at = [], None
+            if updater.save_if_due() and applied_token is not None:
+                _save_resume_token(applied_token)
+        # The stream closed: apply and publish what is still pending
+        if events:
+            apply_events(updater, events)
+            applied_token = stream.resume_token
+        if updater.pending_changes():
+            updater.save()
+            if applied_token is not None:
+                _save_resume_token(applied_token)
+
+# Function to poll for hostels whose updated_at moved forward. Hard deletes are
+# invisible to this query, so every `reconcile_every` polls the set of live _ids
+# is compared with the index.
+def poll_changes(updater, collection, interval=DEFAULT_POLL_SECONDS, reconcile_every=12):
+    projection = dict(EMBED_FIELDS, **ATTRIBUTE_FIELDS, updated_at=1)
+    projection.update((field, 1) for field in SNAPSHOT_FIELDS)
+    watermark = latest_watermark(collection)
+    polls = 0
+    print(f"⏱️ Polling updated_at every {interval}s")
+    while True:
+        time.sleep(interval)
+        hostels, watermark = find_edited_since(collection, watermark, projection)
+        changed = updater.upsert(hostels)
+
+        polls += 1
+        removed = 0
+        if polls % reconcile_every == 0:
+            live = {doc["_id"] for doc in collection.find({}, projection={"_id": 1})}
+            removed = updater.delete([hostel_id for hostel_id in updater.indexed_ids() if hostel_id not in live])
+
+        if changed or removed:
+            print(f"🔄 Re-embedded {changed} changed hostels, removed {removed} ({updater.index.ntotal} hostels indexed)")
+        updater.save_if_due()
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the FAISS index in sync with MongoDB")
+    parser.add_argument("--mode", choices=["auto", "watch", "poll"], default="auto",
+                        help="change streams, updated_at polling, or change streams with polling fallback")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="seconds between polls in poll mode")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file of previously computed embeddings")
+    parser.add_argument("--publish-seconds", type=float, default=DEFAULT_PUBLISH_SECONDS,
+                        help="publish applied changes as a new index version at most this often")
+    parser.add_argument("--embedder", default=config.EMBEDDER, choices=sorted(EMBEDDERS))
+    args = parser.parse_args()
+
+    embedder = get_embedder(args.embedder, api_key=config.GEMINI_API_KEY)
+    updater = IndexUpdater(embedder, cache=EmbeddingCache(args.cache), publish_seconds=args.publish_seconds)
+
+    client = MongoClient(args.mongo_uri)
+    hostel_collection = client["hostelDB"]["hostels"]
+
+    if args.mode in ("auto", "watch"):
+        try:
+            watch_changes(updater, hostel_collection)
+            return
+        except OperationFailure as e:
+            # Standalone servers have no oplog, so no change streams
+            if args.mode == "watch":
+                raise
+            print(f"⚠️ Change streams not available ({e}), falling back to polling updated_at")
+    poll_changes(updater, hostel_collection, interval=args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import numpy as np
+
+VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16}
+DEFAULT_CHUNK_ROWS = 10000
+
+# Full-precision copy of every indexed vector (row = label) kept next to a
+# compressed index, used to re-score its candidates exactly. The file is a
+# .npy array opened memory-mapped, so only the rows of the candidates are read.
+# Vectors upserted after the build are held in `overrides` until the next save,
+# which writes them in `dtype` (float16 halves the file at a small precision cost).
+class VectorStore:
+    def __init__(self, array, overrides=None, dtype=None):
+        self.array = array
+        self.overrides = overrides if overrides is not None else {}
+        self.dtype = np.dtype(VECTOR_DTYPES.get(dtype, dtype) if dtype else array.dtype)
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode="r"))
+
+    @property
+    def dim(self):
+        return self.array.shape[1]
+
+    def __len__(self):
+        return max([len(self.array)] + [label + 1 for label in self.overrides])
+
+    # Function to record new vectors for labels (the updater's upserts)
+    def set_rows(self, labels, vectors):
+        for label, vector in zip(np.asarray(labels).tolist(), vectors):
+            self.overrides[label] = np.asarray(vector, dtype=self.dtype)
+
+    # Function to read the vectors of many labels as float32 in one gather
+    def gather(self, labels):
+        labels = np.asarray(labels, dtype=np.int64)
+        in_file = labels < len(self.array)
+        vectors = np.zeros((len(labels), self.dim), dtype=np.float32)
+        if in_file.any():
+            rows = labels[in_file]
+            # Fancy indexing a memmap reads sorted rows in one pass
+            order = np.argsort(rows, kind="stable")
+            vectors[np.flatnonzero(in_file)[order]] = self.array[rows[order]]
+        if self.overrides:
+            for position, label in enumerate(labels.tolist()):
+                if label in self.overrides:
+                    vectors[position] = self.overrides[label]
+        return vectors
+
+    # Function to write all vectors (file rows plus overrides) to a new .npy file, chunk by chunk
+    def save(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(len(self), self.dim))
+        for offset in range(0, len(self.array), chunk_rows):
+            end = min(offset + chunk_rows, len(self.array))
+            out[offset:end] = self.array[offset:end]
+        for label, vector in self.overrides.items():
+            out[label] = vector
+        out.flush()
+        del out